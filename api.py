@@ -0,0 +1,81 @@
+"""Helpers for the read-only JSON API routes in app.py.
+
+API queries select plain columns, so rows come back as tuples and no ORM
+objects are built. Clients choose columns with ?fields=name,position. The
+response body is serialized with orjson when it is installed and falls
+back to the standard json module otherwise.
+"""
+
+import json
+
+from flask import Response
+
+from models import Team, Player, User
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TEAM_FIELDS = {column.key: column for column in (
+    Team.id, Team.name, Team.city, Team.coach, Team.owner, Team.stadium,
+    Team.established, Team.logo, Team.favorite_count)}
+
+PLAYER_FIELDS = {column.key: column for column in (
+    Player.id, Player.name, Player.age, Player.height, Player.weight, Player.college,
+    Player.group, Player.position, Player.number, Player.salary, Player.seasons,
+    Player.image_url, Player.favorite_count)}
+
+# never email or password
+USER_FIELDS = {column.key: column for column in (User.id, User.username, User.image_url)}
+
+
+class BadRequest(Exception):
+    """The client asked for something the API can't give (unknown field, bad format)."""
+
+
+def requested_fields(available, fields=None):
+    """Column names picked by a ?fields= value, in the order asked; all of them if empty."""
+    if not fields:
+        return list(available)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise BadRequest(f'unknown fields: {", ".join(unknown)}; '
+                         f'choose from {", ".join(available)}')
+    return list(dict.fromkeys(names))
+
+
+def selected_names(names):
+    """Names actually selected for `names`: id first (cursors and lookups need it), then the rest."""
+    return ['id', *(name for name in names if name != 'id')]
+
+
+def columns_for(available, names):
+    return [available[name] for name in selected_names(names)]
+
+
+def shape(rows, names, format='objects'):
+    """Rows from a columns_for(...) query cut down to `names`.
+
+    format 'objects' gives a list of dicts; 'rows' gives {"fields": names,
+    "rows": [[...], ...]}, which skips repeating the keys in every row.
+    """
+    index = {name: i for i, name in enumerate(selected_names(names))}
+    picks = [index[name] for name in names]
+
+    if format == 'rows':
+        return {'fields': names, 'rows': [[row[i] for i in picks] for row in rows]}
+    if format == 'objects':
+        return [dict(zip(names, [row[i] for i in picks])) for row in rows]
+    raise BadRequest(f'unknown format {format!r}; use objects or rows')
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
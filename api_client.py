@@ -0,0 +1,158 @@
+"""HTTP client for api-sports.io shared by the web app and the seed scripts.
+
+One pooled keep-alive session with connect/read timeouts, jittered
+exponential-backoff retries on 429/5xx and connection errors, and a circuit
+breaker that fails fast once the upstream keeps failing.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ApiError(Exception):
+    """The API could not be reached or kept returning errors."""
+
+
+class CircuitOpen(ApiError):
+    """Calls are being refused without trying because the API has been failing."""
+
+
+def response_list(res, path):
+    """The 'response' list from a reply's JSON body.
+
+    api-sports reports rate limits and bad keys as a 200 with an empty
+    'response' and a non-empty 'errors'; that raises ApiError rather than
+    looking like an empty result (which callers would cache as "no data").
+    """
+    body = res.json()
+    if body.get('errors'):
+        raise ApiError(f'GET {path} returned errors: {body["errors"]}')
+    return body['response']
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` straight failures; half-open again after `reset_timeout`.
+
+    While half-open a single trial call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+
+class ApiClient:
+    """GET requests against the API over a shared connection pool.
+
+    timeout: (connect, read) seconds for each attempt.
+    retries: extra attempts after the first for retryable failures.
+    backoff: base seconds for the full-jitter exponential backoff.
+    max_delay: longest wait between attempts. A Retry-After longer than this
+        ends the retries, since the client runs on web request threads.
+    """
+
+    def __init__(self, base_url, api_key, timeout=(3.05, 10), retries=3, backoff=0.5,
+                 max_delay=5, pool_size=10, breaker=None, sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        self.session.headers['x-apisports-key'] = api_key
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _delay(self, attempt, res=None):
+        """Seconds to wait before the next attempt, or None if it's not worth waiting."""
+        retry_after = res is not None and res.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return int(retry_after) if int(retry_after) <= self.max_delay else None
+        return min(random.uniform(0, self.backoff * 2 ** attempt), self.max_delay)
+
+    def get(self, path, params=None):
+        """GET `path` and return the requests.Response once it succeeds.
+
+        Raises CircuitOpen without calling out while the breaker is open, and
+        ApiError when every attempt fails.
+        """
+        url = f'{self.base_url}/{path.lstrip("/")}'
+
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpen(f'{self.base_url} is failing; not calling {path}')
+
+            res = None
+            try:
+                res = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                # any transport failure (reset, bad chunking, ...) must count, or a
+                # half-open trial never finishes and the circuit stays shut
+                error = ApiError(f'GET {path} failed: {e}')
+            else:
+                if res.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    if not res.ok:
+                        raise ApiError(f'GET {path} returned {res.status_code}')
+                    return res
+                error = ApiError(f'GET {path} returned {res.status_code}')
+
+            self.breaker.record_failure()
+            if attempt < self.retries:
+                delay = self._delay(attempt, res)
+                if delay is None:
+                    break
+                self.sleep(delay)
+
+        raise error
+
+    def response(self, path, params=None):
+        """The 'response' list from an API endpoint's JSON body; see response_list."""
+        return response_list(self.get(path, params), path)
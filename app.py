@@ -1,15 +1,33 @@
 import os
-import requests
+import time
 
-from flask import Flask, render_template, request, flash, redirect, session, g
+from markupsafe import Markup
+from flask import Flask, render_template, request, flash, redirect, session, g, jsonify, url_for, abort
 from flask_debugtoolbar import DebugToolbarExtension
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from sqlalchemy import desc
+from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
 from secret import API_KEY
 from forms import UserAddForm, LoginForm, UserEditForm
 
 # from forms import UserAddForm, LoginForm, MessageForm, UserEditForm
-from models import db, connect_db, User, Team, Player
+from models import db, connect_db, User, Team, Player, PlayerStatistic, TeamPlayers
+from stats_cache import StatsCache, DatabaseBackend
+from fragment_cache import FragmentCache, fill_favorites
+from http_cache import ConditionalGet, tree_mtime
+from api_client import ApiClient, ApiError, CircuitBreaker
+from search import search_players, search_users
+from pagination import keyset_page, ranked_page
+from grouping import group_players, depth_chart
+from roster_snapshot import RosterSnapshots, PlayerRecord
+from api import (TEAM_FIELDS, PLAYER_FIELDS, USER_FIELDS, BadRequest,
+                 requested_fields, columns_for, shape, json_response)
+from query_counter import init_query_counter, query_budget
+from passwords import hasher, HasherBusy
+from auth import SlidingWindowLimiter, RateLimited
+from session_user import load_session_user, remember_user, forget_user, bump_version, note_deleted
 
 API_BASE_URL = 'https://v1.american-football.api-sports.io'
 CURR_USER_KEY = "curr_user"
@@ -24,29 +42,203 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ECHO'] = False
 app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = True
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', "it's a secret")
+# seconds a cached session user is trusted before it is checked against the database
+app.config['SESSION_USER_TTL'] = int(os.environ.get('SESSION_USER_TTL', 5 * 60))
+app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', 48))
+app.config['API_CONNECT_TIMEOUT'] = float(os.environ.get('API_CONNECT_TIMEOUT', 3.05))
+app.config['API_READ_TIMEOUT'] = float(os.environ.get('API_READ_TIMEOUT', 10))
+app.config['API_RETRIES'] = int(os.environ.get('API_RETRIES', 2))
+# longest wait between retries; an upstream Retry-After beyond it fails the call instead
+app.config['API_MAX_RETRY_DELAY'] = float(os.environ.get('API_MAX_RETRY_DELAY', 5))
+app.config['API_BREAKER_THRESHOLD'] = int(os.environ.get('API_BREAKER_THRESHOLD', 5))
+app.config['API_BREAKER_RESET'] = int(os.environ.get('API_BREAKER_RESET', 30))
+app.config['STATS_CACHE_TTL'] = int(os.environ.get('STATS_CACHE_TTL', 6 * 60 * 60))
+app.config['STATS_CACHE_STALE_TTL'] = int(os.environ.get('STATS_CACHE_STALE_TTL', 24 * 60 * 60))
+app.config['STATS_CACHE_MAX_ENTRIES'] = int(os.environ.get('STATS_CACHE_MAX_ENTRIES', 2048))
+app.config['STATS_CACHE_BACKEND'] = os.environ.get('STATS_CACHE_BACKEND', 'memory')
+# when False, only stats stored by ingest_stats.py are shown
+app.config['STATS_LIVE_FALLBACK'] = os.environ.get('STATS_LIVE_FALLBACK', '1') == '1'
+# bcrypt cost factor; stored hashes at another cost are rehashed on login
+app.config['PASSWORD_HASH_ROUNDS'] = int(os.environ.get('PASSWORD_HASH_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+app.config['PASSWORD_HASH_TIMEOUT'] = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+# login/signup attempts allowed per client IP and per username in AUTH_RATE_WINDOW seconds
+app.config['AUTH_RATE_WINDOW'] = int(os.environ.get('AUTH_RATE_WINDOW', 5 * 60))
+app.config['AUTH_IP_LIMIT'] = int(os.environ.get('AUTH_IP_LIMIT', 30))
+app.config['AUTH_USERNAME_LIMIT'] = int(os.environ.get('AUTH_USERNAME_LIMIT', 10))
+# proxies in front of the app whose X-Forwarded-For/-Proto are trusted; set to 1 on Render
+app.config['PROXY_FIX_HOPS'] = int(os.environ.get('PROXY_FIX_HOPS', 0))
+app.config['API_PAGE_SIZE'] = int(os.environ.get('API_PAGE_SIZE', 100))
+app.config['API_MAX_PAGE_SIZE'] = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+app.config['LEADERBOARD_SIZE'] = int(os.environ.get('LEADERBOARD_SIZE', 12))
+app.config['LEADERBOARD_TTL'] = int(os.environ.get('LEADERBOARD_TTL', 60))
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 512))
+# seconds before a roster data version bumped by another process is noticed
+app.config['FRAGMENT_VERSION_TTL'] = int(os.environ.get('FRAGMENT_VERSION_TTL', 5))
 # toolbar = DebugToolbarExtension(app)
 
+if app.config['PROXY_FIX_HOPS']:
+    # so request.remote_addr is the visitor, not the proxy, when keying rate limits
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'],
+                            x_proto=app.config['PROXY_FIX_HOPS'])
+
 connect_db(app)
+init_query_counter(app, db.engine)
+hasher.init_app(app)
+
+api = ApiClient(API_BASE_URL, API_KEY,
+                timeout=(app.config['API_CONNECT_TIMEOUT'], app.config['API_READ_TIMEOUT']),
+                retries=app.config['API_RETRIES'],
+                max_delay=app.config['API_MAX_RETRY_DELAY'],
+                breaker=CircuitBreaker(app.config['API_BREAKER_THRESHOLD'],
+                                       app.config['API_BREAKER_RESET']))
+
+
+def paginate(endpoint, query, columns, search_fn, descending=False, **url_args):
+    """Page of rows for a list view plus prev/next links.
+
+    With a ?q= search the ranked results are paged by offset, otherwise
+    `query` is paged by keyset on `columns`. url_args are kept on the
+    prev/next links.
+    """
+    size = app.config['PAGE_SIZE']
+    search = request.args.get('q')
+
+    if search:
+        page = ranked_page(lambda limit: search_fn(search, limit), size,
+                           request.args.get('offset', 0, type=int))
+        next_url = page.next_cursor and url_for(endpoint, q=search, offset=page.next_cursor)
+        prev_url = page.prev_cursor and url_for(endpoint, q=search, offset=page.prev_cursor)
+    else:
+        page = keyset_page(query, columns, size,
+                           after=request.args.get('after'), before=request.args.get('before'),
+                           descending=descending)
+        next_url = page.next_cursor and url_for(endpoint, after=page.next_cursor, **url_args)
+        prev_url = page.prev_cursor and url_for(endpoint, before=page.prev_cursor, **url_args)
+
+    return page, prev_url, next_url
+
+
+def fetch_player_stats(lookup_id, season):
+    """Get a player's stat groups for a season from the API, or None if there are none."""
+    res = api.response('players/statistics', {'id': lookup_id, 'season': season})
+    if len(res) == 0:
+        return None
+    return res[0]['teams'][0]['groups']
+
+
+stats_cache = StatsCache(
+    fetch_player_stats,
+    ttl=app.config['STATS_CACHE_TTL'],
+    stale_ttl=app.config['STATS_CACHE_STALE_TTL'],
+    max_entries=app.config['STATS_CACHE_MAX_ENTRIES'],
+    backend=DatabaseBackend(app) if app.config['STATS_CACHE_BACKEND'] == 'database' else None)
+
+
+def player_stat_groups(player, season=YEAR):
+    """Stored stats for a player, falling back to the cached API when none are stored.
+
+    If the API is down and nothing is cached, the page just shows no stats.
+    """
+    stat_groups = PlayerStatistic.groups_for(player.id, season)
+    if stat_groups is None and app.config['STATS_LIVE_FALLBACK']:
+        try:
+            stat_groups = stats_cache.get(player.lookup_id, season)
+        except ApiError:
+            stat_groups = None
+    return stat_groups
+
+
+fragments = FragmentCache(max_entries=app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+                          version_ttl=app.config['FRAGMENT_VERSION_TTL'])
+
+# teams and players served from memory, rebuilt when the roster data version changes
+rosters = RosterSnapshots(fragments)
+
+
+def snapshot_team_or_404(snapshot, id):
+    team = snapshot.team(id)
+    if team is None:
+        abort(404)
+    return team
+
+
+def snapshot_player_or_404(snapshot, id):
+    player = snapshot.player(id)
+    if player is None:
+        abort(404)
+    return player
+
+# mixed into ETags so a deploy with new templates/static files isn't answered with 304s
+app.config['HTTP_CACHE_SALT'] = os.environ.get(
+    'HTTP_CACHE_SALT', str(tree_mtime(os.path.join(app.root_path, app.template_folder), app.static_folder)))
+http_cache = ConditionalGet(fragments, salt=app.config['HTTP_CACHE_SALT'])
+
+
+def render_fragment(template, **context):
+    """Render a page body template with the favorite buttons for g.user filled in."""
+    html = render_template(template, favorite_markers=True, **context)
+    return render_template('page.html', content=Markup(fill_favorites(html)))
+
+
+def render_cached(template, load, key=None):
+    """Like render_fragment, but the body is cached per key (default: path) and roster data version.
+
+    load() returns the template context and is only called on a cache miss.
+    """
+    html = fragments.get_or_render(
+        key or request.path, lambda: render_template(template, favorite_markers=True, **load()))
+    return render_template('page.html', content=Markup(fill_favorites(html)))
+
+ip_limiter = SlidingWindowLimiter(app.config['AUTH_IP_LIMIT'], app.config['AUTH_RATE_WINDOW'])
+username_limiter = SlidingWindowLimiter(app.config['AUTH_USERNAME_LIMIT'], app.config['AUTH_RATE_WINDOW'])
+
+
+@app.errorhandler(RateLimited)
+def too_many_attempts(e):
+    """Login/signup attempts over the limit; nothing was hashed."""
+    return ('Too many attempts, please try again later.', 429,
+            {'Retry-After': str(e.retry_after)})
+
+
+@app.errorhandler(HasherBusy)
+def password_hashing_busy(e):
+    """Too many logins/signups at once; ask the client to retry shortly."""
+    return 'Too many sign-ins right now, please try again in a moment.', 503, {'Retry-After': '1'}
 
 
 @app.before_request
 def add_user_to_g():
-    """If we're logged in, add curr user to Flask global."""
+    """If we're logged in, add curr user to Flask global.
+
+    The user comes from the session payload when it is current, and
+    favorite ids are only queried if something on the page checks them.
+    """
 
     if CURR_USER_KEY in session:
-        g.user = User.query.get(session[CURR_USER_KEY])
+        g.user = load_session_user(session[CURR_USER_KEY], app.config['SESSION_USER_TTL'])
+        if g.user is None:
+            del session[CURR_USER_KEY]
 
     else:
         g.user = None
 
+    if g.user:
+        g.favorite_team_ids = LocalProxy(lambda: g.user.favorite_team_ids)
+        g.favorite_player_ids = LocalProxy(lambda: g.user.favorite_player_ids)
+    else:
+        g.favorite_team_ids, g.favorite_player_ids = set(), set()
+
 # VIEW ROUTES FOR INFO #
         
 @app.route('/')
+@query_budget(6)
+@http_cache.conditional
 def show_homepage():
     """Render hompage"""
 
-    teams = Team.query.all()
-    return render_template('home.html', teams=teams)
+    return render_cached('home.html', lambda: {'teams': rosters.get().teams})
 ### AUTH ROUTES ###---------------------------------------------------------------------
 
 @app.route('/signup', methods=['GET', 'POST'])
@@ -55,6 +247,7 @@ def signup_user():
     form = UserAddForm()
 
     if form.validate_on_submit():
+        ip_limiter.check(request.remote_addr)
         try:
             user = User.register(
                 username=form.username.data,
@@ -67,6 +260,7 @@ def signup_user():
             flash('Username/email already taken', 'danger')
             return render_template('users/signup.html', form=form)
         session[CURR_USER_KEY] = user.id
+        remember_user(user)
         return redirect('/')
 
     return render_template('users/signup.html', form=form)
@@ -78,9 +272,15 @@ def login():
     form = LoginForm()
 
     if form.validate_on_submit():
+         ip_limiter.check(request.remote_addr)
+         username_limiter.check(form.username.data)
          user = User.authenticate(username=form.username.data, pwd=form.password.data)
          if user:
+             username_limiter.reset(form.username.data)
+             # saves the password if authenticate rehashed it at a new cost
+             db.session.commit()
              session[CURR_USER_KEY] = user.id
+             remember_user(user)
              flash(f'Welcome back {user.username}!', 'success')
              return redirect('/')
          flash('Invalid username/password!', 'danger')
@@ -92,24 +292,31 @@ def logout():
     """logout user in session"""
     if CURR_USER_KEY in session:
         del session[CURR_USER_KEY]
+    forget_user()
     flash('Logout successful!', 'success!')
     return redirect('/')
 
 ### USER FAVORTIE ROUTES ###--------------------------------------
         
+FAVORITE_KINDS = ('team', 'player')
+
+
+def save_favorites(teams=None, players=None):
+    """Apply {id: favorite?} changes for g.user in one transaction."""
+    User.set_favorites(g.user.id, teams=teams, players=players)
+    bump_version(g.user.id)
+    db.session.commit()
+
+
 @app.route('/users/toggle-favorite-team/<int:id>', methods=['POST'])
 def toggle_favorite_team(id):
     """if valid user, removes favorite if in team_favorites"""
     if not g.user:
         return 'Unauthorized'
-    team = Team.query.get_or_404(id)
-    if team in g.user.favorite_teams:
-        g.user.favorite_teams.remove(team)
-        db.session.commit()
-        return 'Favorite removed'
-    g.user.favorite_teams.append(team)
-    db.session.commit()
-    return 'Favorite added'
+    team = snapshot_team_or_404(rosters.get(), id)
+    favorite = not g.user.is_favorite_team(team)
+    save_favorites(teams={team.id: favorite})
+    return 'Favorite added' if favorite else 'Favorite removed'
 
 
 @app.route('/users/toggle-favorite-player/<int:id>', methods=['POST'])
@@ -117,32 +324,74 @@ def toggle_favorite_player(id):
     """if valid user, removes favorite if in team_favorites"""
     if not g.user:
         return 'Unauthorized'
-    player = Player.query.get_or_404(id)
-    if player in g.user.favorite_players:
-        g.user.favorite_players.remove(player)
-        db.session.commit()
-        return 'Favorite removed'
-    g.user.favorite_players.append(player)
-    db.session.commit()
-    return 'Favorite added'
+    player = snapshot_player_or_404(rosters.get(), id)
+    favorite = not g.user.is_favorite_player(player)
+    save_favorites(players={player.id: favorite})
+    return 'Favorite added' if favorite else 'Favorite removed'
+
+
+@app.route('/api/favorites', methods=['POST'])
+@query_budget(12)
+def update_favorites():
+    """Apply a batch of favorite changes sent by app.js.
+
+    Body: {"ops": [{"kind": "team"|"player", "id": 12, "favorite": true}, ...]}.
+    Later ops for the same team/player win, and re-adding or re-removing is a
+    no-op. Responds with the user's favorite ids after the change.
+    """
+    if not g.user:
+        return jsonify(error='Unauthorized'), 401
+
+    ops = (request.get_json(silent=True) or {}).get('ops')
+    if not isinstance(ops, list):
+        return jsonify(error='expected {"ops": [...]}'), 400
+
+    changes = {kind: {} for kind in FAVORITE_KINDS}
+    for op in ops:
+        if (not isinstance(op, dict) or op.get('kind') not in FAVORITE_KINDS
+                or type(op.get('id')) is not int or not isinstance(op.get('favorite'), bool)):
+            return jsonify(error=f'invalid op: {op!r}'), 400
+        changes[op['kind']][op['id']] = op['favorite']
+
+    if ops:
+        save_favorites(teams=changes['team'], players=changes['player'])
+
+    team_ids, player_ids = User.favorite_ids_for(g.user.id)
+    return jsonify(team_ids=sorted(team_ids), player_ids=sorted(player_ids))
+
+@app.route('/leaderboard')
+@query_budget(6)
+def show_leaderboard():
+    """Most favorited teams and players.
+
+    Rankings come straight off the favorite_count columns and the rendered
+    list is cached for LEADERBOARD_TTL seconds.
+    """
+    size = app.config['LEADERBOARD_SIZE']
+    bucket = int(time.time() // app.config['LEADERBOARD_TTL'])
+    return render_cached('leaderboard.html',
+                         lambda: {'teams': Team.most_favorited(size),
+                                  'players': Player.most_favorited(size),
+                                  'show_favorite_count': True},
+                         key=('leaderboard', bucket))
 
 ### USER PROFILE ROUTES ###------------------------------
 
 @app.route('/users/<int:id>')
+@query_budget(6)
 def users_show(id):
     """show user profile."""
-    user = User.query.get_or_404(id)
+    user = User.query.options(selectinload(User.favorite_teams)).filter_by(id=id).first_or_404()
     return render_template('users/show.html', user=user)
 
 
 @app.route('/users/<int:id>/players')
+@query_budget(6)
 def show_favorite_players(id):
     """show users favorite players"""
     user = User.query.get_or_404(id)
-    offense = [player for player in user.favorite_players if player.group =='Offense']
-    defense = [player for player in user.favorite_players if player.group =='Defense']
-    special_teams = [player for player in user.favorite_players if player.group =='Special Teams']
-    return render_template('users/players.html', user=user, offense=offense, defense=defense, special_teams=special_teams)
+    groups = group_players(Player.favorites_of(id))
+    return render_template('users/players.html', user=user, groups=groups)
 
 
 @app.route('/users/profile', methods=['GET', 'POST'])
@@ -160,11 +409,14 @@ def edit_profile():
             auth_user.username = form.username.data
             auth_user.email = form.email.data
             auth_user.image_url = form.image_url.data
+            auth_user.session_version += 1
             try:
                 db.session.commit()
             except IntegrityError:
+                db.session.rollback()
                 flash('Username or email already taken!', 'danger')
                 return render_template('users/edit.html', form=form, user=user)
+            remember_user(auth_user)
             return redirect(f'/users/{auth_user.id}')
         flash('Invaid credentials.', 'danger')
         return render_template('users/edit.html', form=form, user=user)
@@ -179,85 +431,239 @@ def delete_user():
         return redirect("/")
     if CURR_USER_KEY in session:
         del session[CURR_USER_KEY]   
-    db.session.delete(g.user)
+    forget_user()
+    User.clear_favorites(g.user.id)
+    db.session.delete(g.user.model)
     db.session.commit()
+    note_deleted(g.user.id)
     flash("Account deleted successfully", "success")
     return redirect("/")
 
 @app.route('/users')
+@query_budget(6)
 def list_users():
-    """page that lists all players.  can also take a query string to search by the name."""
-    search = request.args.get('q')
-
-    if not search:
-        users = User.query.all()
-    else:
-        users = User.query.filter(User.username.like(f"%{search}%"))
-    
-    return render_template('users/all-users.html', users=users)
+    """page that lists all users.  can also take a query string to search by the name."""
+    page, prev_url, next_url = paginate('list_users', User.query, [User.username, User.id], search_users)
+    return render_template('users/all-users.html', users=page.items,
+                           prev_url=prev_url, next_url=next_url)
 
 ### TEAM ROUTES ###--------------------------------------
 
 @app.route('/teams/<int:id>')
+@query_budget(6)
+@http_cache.conditional
 def show_team_profile(id):
     """show team profile"""
-    team = Team.query.get_or_404(id)
-    return render_template('teams/show.html', team=team)
+    snapshot = rosters.get()
+    team = snapshot_team_or_404(snapshot, id)
+    return render_cached('teams/show.html', lambda: {'team': team, 'players': snapshot.roster(id)})
 
 
 @app.route('/teams/<int:id>/offense')
+@query_budget(6)
+@http_cache.conditional
 def show_team_offense(id):
     """show team profile"""
-    team = Team.query.get_or_404(id)
-    all_offense = Player.query.filter(Player.group=='Offense').order_by(Player.name.asc()).all()
-    offense = [player for player in all_offense if player.teams[0].id == id]
-    return render_template('teams/offense.html', offense=offense, team=team)
+    snapshot = rosters.get()
+    team = snapshot_team_or_404(snapshot, id)
+    return render_cached('teams/offense.html', lambda: {'team': team, 'offense': snapshot.roster(id, 'Offense')})
 
 
 @app.route('/teams/<int:id>/defense')
+@query_budget(6)
+@http_cache.conditional
 def show_team_defense(id):
     """show team profile"""
-    team = Team.query.get_or_404(id)
-    all_defense = Player.query.filter(Player.group=='Defense').order_by(Player.name.asc()).all()
-    defense = [player for player in all_defense if player.teams[0].id == id]
-    return render_template('teams/defense.html', defense=defense, team=team)
+    snapshot = rosters.get()
+    team = snapshot_team_or_404(snapshot, id)
+    return render_cached('teams/defense.html', lambda: {'team': team, 'defense': snapshot.roster(id, 'Defense')})
 
 
 @app.route('/teams/<int:id>/special-teams')
+@query_budget(6)
+@http_cache.conditional
 def show_team_special_teams(id):
     """show team profile"""
-    team = Team.query.get_or_404(id)
-    all_special = Player.query.filter(Player.group=='Special Teams').order_by(Player.name.asc()).all()
-    special = [player for player in all_special if player.teams[0].id == id]
-    return render_template('teams/special-teams.html', special=special, team=team)
+    snapshot = rosters.get()
+    team = snapshot_team_or_404(snapshot, id)
+    return render_cached('teams/special-teams.html', lambda: {'team': team, 'special': snapshot.roster(id, 'Special Teams')})
+
+
+@app.route('/teams/<int:id>/depth-chart')
+@query_budget(6)
+@http_cache.conditional
+def show_team_depth_chart(id):
+    """Whole roster by group and position, with the user's favorites on it listed first."""
+    snapshot = rosters.get()
+    team = snapshot_team_or_404(snapshot, id)
+    players = snapshot.roster(id)
+    chart = depth_chart(players)
+    favorites = [player for player in players if player.id in g.favorite_player_ids]
+    return render_fragment('teams/depth-chart.html', team=team, chart=chart,
+                           favorites=group_players(favorites))
 
 ### PLAYER ROUTES ###--------------------------------------------------------------------
 @app.route('/players')
+@query_budget(6)
+# favorite counts change without bumping anything the ETag covers
+@http_cache.conditional(unless=lambda: request.args.get('sort') == 'popular')
 def list_players():
-    """page that lists all players.  can also take a query string to search by the name."""
-    search = request.args.get('q')
-
-    if not search:
-        players = Player.query.all()
+    """page that lists all players.  can also take a query string to search by the name.
+
+    ?sort=popular orders them by how many users favorited them.
+    """
+    if request.args.get('sort') == 'popular':
+        page, prev_url, next_url = paginate('list_players', Player.query,
+                                            [Player.favorite_count, Player.id], search_players,
+                                            descending=True, sort='popular')
     else:
-        players = Player.query.filter(Player.name.like(f"%{search}%"))
-
-        print(players)
-    
-    return render_template('players/all-players.html', players=players)
+        page, prev_url, next_url = paginate('list_players', Player.query,
+                                            [Player.name, Player.id], search_players)
+    return render_template('players/all-players.html', players=page.items or None,
+                           prev_url=prev_url, next_url=next_url,
+                           sort=request.args.get('sort'))
 
 
 @app.route('/players/<int:id>')
+@query_budget(6)
 def show_player_profile(id):
-    """Show player profile with stats"""
-    player = Player.query.get_or_404(id)
-    headers = {'x-apisports-key': API_KEY}
-    params = {'id': player.lookup_id, 'season': YEAR}
-
-    res = requests.get(f'{API_BASE_URL}/players/statistics', headers=headers, params=params)
-    res = res.json()
-    if len(res['response']) == 0:
-        stat_groups = None
-    else:
-        stat_groups = res['response'][0]['teams'][0]['groups']
-    return render_template('players/stats.html', player=player, stat_groups=stat_groups)
\ No newline at end of file
+    """Show player profile with stats.
+
+    Stored stats are rendered inline. Otherwise the page is sent straight away
+    and app.js loads the stats panel from show_player_stats.
+    """
+    player = snapshot_player_or_404(rosters.get(), id)
+    stat_groups = PlayerStatistic.groups_for(player.id, YEAR)
+    deferred = stat_groups is None and app.config['STATS_LIVE_FALLBACK']
+    return render_template('players/stats.html', player=player, stat_groups=stat_groups, deferred=deferred)
+
+
+@app.route('/players/<int:id>/stats')
+@query_budget(6)
+def show_player_stats(id):
+    """HTML fragment of a player's stat groups, loaded by app.js on the player page."""
+    player = snapshot_player_or_404(rosters.get(), id)
+    return render_template('players/stat-groups.html', stat_groups=player_stat_groups(player))
+
+
+@app.route('/api/players/<int:id>/stats')
+@query_budget(6)
+def player_stats_json(id):
+    """JSON stat groups for a player. Concurrent requests for the same player share one API call."""
+    player = snapshot_player_or_404(rosters.get(), id)
+    season = request.args.get('season', YEAR, type=int)
+    return jsonify(player_id=player.id, season=season, stat_groups=player_stat_groups(player, season))
+
+
+### JSON API ROUTES ###--------------------------------------------------------------------
+
+@app.errorhandler(BadRequest)
+def api_bad_request(e):
+    return json_response({'error': str(e)}, 400)
+
+
+def api_list(endpoint, available, filter_query=None, **url_args):
+    """One keyset page of rows as JSON, with only the ?fields= asked for.
+
+    filter_query(query) narrows the column query, e.g. to one roster.
+    ?limit= sets the page size (up to API_MAX_PAGE_SIZE), ?format=rows
+    sends a field list plus arrays instead of one object per row.
+    """
+    names = requested_fields(available, request.args.get('fields'))
+    format = request.args.get('format', 'objects')
+    size = min(max(request.args.get('limit', app.config['API_PAGE_SIZE'], type=int), 1),
+               app.config['API_MAX_PAGE_SIZE'])
+
+    query = db.session.query(*columns_for(available, names))
+    if filter_query is not None:
+        query = filter_query(query)
+    page = keyset_page(query, [available['id']], size,
+                       after=request.args.get('after'), before=request.args.get('before'))
+
+    link_args = dict(url_args, fields=request.args.get('fields'), format=request.args.get('format'),
+                     limit=request.args.get('limit'))
+    return json_response({
+        'data': shape(page.items, names, format),
+        'next': page.next_cursor and url_for(endpoint, after=page.next_cursor, **link_args),
+        'prev': page.prev_cursor and url_for(endpoint, before=page.prev_cursor, **link_args),
+    })
+
+
+def api_item(available, id):
+    """A single row by id as JSON, with only the ?fields= asked for."""
+    names = requested_fields(available, request.args.get('fields'))
+    format = request.args.get('format', 'objects')
+    row = db.session.query(*columns_for(available, names)).filter(available['id'] == id).first()
+    if row is None:
+        return json_response({'error': 'not found'}, 404)
+    return json_response({'data': shape([row], names, format)})
+
+
+@app.route('/api/teams')
+@query_budget(4)
+def api_teams():
+    """All teams."""
+    return api_list('api_teams', TEAM_FIELDS)
+
+
+@app.route('/api/teams/<int:id>')
+@query_budget(4)
+def api_team(id):
+    return api_item(TEAM_FIELDS, id)
+
+
+@app.route('/api/teams/<int:id>/players')
+@query_budget(4)
+def api_team_players(id):
+    """A team's roster; ?group= limits it to Offense, Defense or Special Teams."""
+    if db.session.query(Team.id).filter_by(id=id).first() is None:
+        return json_response({'error': 'not found'}, 404)
+    group = request.args.get('group')
+
+    def roster(query):
+        query = (query.join(TeamPlayers, TeamPlayers.player_id == Player.id)
+                 .filter(TeamPlayers.team_id == id))
+        return query.filter(Player.group == group) if group else query
+
+    return api_list('api_team_players', PLAYER_FIELDS, roster, id=id, group=group)
+
+
+@app.route('/api/players')
+@query_budget(4)
+def api_players():
+    return api_list('api_players', PLAYER_FIELDS)
+
+
+@app.route('/api/players/names')
+@query_budget(4)
+def api_player_names():
+    """Up to ?limit= (10) players whose name starts with ?prefix=, served from the roster snapshot."""
+    names = requested_fields(PlayerRecord._fields, request.args.get('fields') or 'id,name')
+    limit = min(request.args.get('limit', 10, type=int), app.config['API_MAX_PAGE_SIZE'])
+    players = rosters.get().players_named(request.args.get('prefix', ''), limit)
+    return json_response({'data': [{name: getattr(player, name) for name in names}
+                                   for player in players]})
+
+
+@app.route('/api/players/<int:id>')
+@query_budget(4)
+def api_player(id):
+    return api_item(PLAYER_FIELDS, id)
+
+
+@app.route('/api/users')
+@query_budget(4)
+def api_users():
+    return api_list('api_users', USER_FIELDS)
+
+
+@app.route('/api/users/<int:id>')
+@query_budget(4)
+def api_user(id):
+    return api_item(USER_FIELDS, id)
+
+
+@app.route('/stats-cache')
+def show_stats_cache():
+    """Hit/miss/refresh counters for the player stats cache."""
+    return jsonify(stats_cache.stats())
\ No newline at end of file
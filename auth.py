@@ -0,0 +1,99 @@
+"""Keep logins from being a cheap way to burn bcrypt time.
+
+- verify_password runs exactly one bcrypt check whether or not the username
+  exists, so response time doesn't reveal which usernames are real.
+- SlidingWindowLimiter caps attempts per key (client IP, username) over a
+  rolling window. /login and /signup check it before any hashing happens.
+
+Limiter state lives in each worker process, so the effective limit is
+per worker; that is enough to stop one client from hammering a worker.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from passwords import hasher
+
+_dummy_hashes = {}
+
+
+class RateLimited(Exception):
+    """Too many attempts; retry_after is the number of seconds until the next is allowed."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'rate limited, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+def dummy_hash():
+    """A hash at the configured cost to check against when there is no such user."""
+    rounds = hasher.rounds
+    if rounds not in _dummy_hashes:
+        _dummy_hashes[rounds] = hasher.hash('not-a-real-password')
+    return _dummy_hashes[rounds]
+
+
+def verify_password(user, password):
+    """Is `password` right for `user`? Costs one bcrypt check even when user is None."""
+    if user is None:
+        hasher.check(dummy_hash(), password)
+        return False
+    return hasher.check(user.password, password)
+
+
+class SlidingWindowLimiter:
+    """At most `limit` attempts per key in any `window` seconds.
+
+    Keeps the times of the last `limit` attempts for each key, so memory is
+    bounded by limit x active keys; idle keys are pruned as hits come in.
+    """
+
+    PRUNE_EVERY = 1024
+
+    def __init__(self, limit, window, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self._attempts = {}
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Record an attempt for `key`; return 0, or seconds to wait if over the limit."""
+        now = self.clock()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+
+            if len(attempts) >= self.limit:
+                return attempts[0] + self.window - now
+
+            attempts.append(now)
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                self._prune(now)
+            return 0
+
+    def check(self, key):
+        """Like hit, but raise RateLimited instead of returning a wait."""
+        wait = self.hit(key)
+        if wait:
+            raise RateLimited(math.ceil(wait))
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        for key in [key for key, attempts in self._attempts.items()
+                    if not attempts or attempts[-1] <= cutoff]:
+            del self._attempts[key]
+
+    def __len__(self):
+        return len(self._attempts)
@@ -0,0 +1,78 @@
+"""Compare the old per-player commit seed path with bulk_load.load_rosters.
+
+    $ python3.12 benchmarks/bulk_load.py [--teams 32] [--players 53]
+
+Runs against DATABASE_URL (a throwaway SQLite file by default), dropping and
+recreating the schema before each run, so never point it at a real database.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{tempfile.gettempdir()}/bulk_load_bench.db')
+
+from app import db  # noqa: E402
+from models import Team, Player  # noqa: E402
+from bulk_load import load_rosters, team_fields, player_fields  # noqa: E402
+
+
+def synthetic_rosters(num_teams, num_players):
+    rosters = []
+    for t in range(num_teams):
+        team = {'id': t, 'name': f'Team {t}', 'city': f'City {t}', 'coach': f'Coach {t}',
+                'owner': f'Owner {t}', 'stadium': f'Stadium {t}', 'established': 1960,
+                'logo': f'https://example.com/teams/{t}.png'}
+        players = [{'id': t * 1000 + n, 'name': f'Player {t}-{n}', 'age': 25, 'height': "6' 2\"",
+                    'weight': '220 lbs', 'college': 'LSU',
+                    'group': ('Offense', 'Defense', 'Special Teams')[n % 3],
+                    'position': 'QB', 'number': n, 'salary': '$1,000,000', 'experience': 4,
+                    'image': f'https://example.com/players/{t}-{n}.png'}
+                   for n in range(num_players)]
+        rosters.append((team, players))
+    return rosters
+
+
+def per_row_commit(rosters):
+    """The original seed.py loop: one commit per team and per player."""
+    for team, players in rosters:
+        t = Team(**team_fields(team))
+        db.session.add(t)
+        db.session.commit()
+        for player in players:
+            p = Player(**player_fields(player))
+            t.players.append(p)
+            db.session.add(p)
+            db.session.commit()
+
+
+def bulk(rosters):
+    load_rosters(rosters)
+
+
+def run(name, load, rosters):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    start = time.perf_counter()
+    load(rosters)
+    elapsed = time.perf_counter() - start
+    count = Player.query.count()
+    print(f'{name:>16}: {elapsed:8.3f}s  ({count} players)')
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=32)
+    parser.add_argument('--players', type=int, default=53, help='players per team')
+    args = parser.parse_args()
+
+    rosters = synthetic_rosters(args.teams, args.players)
+    print(f'database: {db.engine.url.render_as_string(hide_password=True)}')
+    slow = run('per-row commit', per_row_commit, rosters)
+    fast = run('bulk load', bulk, rosters)
+    print(f'{"speedup":>16}: {slow / fast:8.1f}x')
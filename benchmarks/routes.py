@@ -0,0 +1,254 @@
+"""Latency, queries per request and throughput for the main Flask routes.
+
+    $ python3.12 benchmarks/routes.py [--scale 1] [--users 2000] [--requests 200]
+                                      [--concurrency 4] [--logged-in] [--json results.json]
+
+Seeds a synthetic league (32 teams x --scale, --players per team) plus
+--users users with random favorites, points the stats API client at a
+local stub server, then calls each route in-process through the Flask test
+client. For every route it prints p50/p99 latency, mean SQL queries per
+request and requests per second. Pass --json to save the numbers for
+comparing runs.
+
+Runs against DATABASE_URL (a throwaway SQLite file by default), dropping and
+recreating the schema first, so never point it at a real database.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{tempfile.gettempdir()}/routes_bench.db')
+
+from sqlalchemy import event  # noqa: E402
+
+import app as flask_app  # noqa: E402
+from app import app, db, api, CURR_USER_KEY  # noqa: E402
+from models import User, TeamFavorites, PlayerFavorites, recount_favorites  # noqa: E402
+from bulk_load import load_rosters  # noqa: E402
+from passwords import hasher  # noqa: E402
+
+GROUPS = ('Offense', 'Defense', 'Special Teams')
+POSITIONS = {'Offense': ('QB', 'RB', 'WR', 'TE', 'OT', 'G', 'C'),
+             'Defense': ('DE', 'DT', 'LB', 'CB', 'S'),
+             'Special Teams': ('K', 'P', 'LS')}
+FIRST = ('Aaron', 'Brandon', 'Chris', 'Derrick', 'Eli', 'Frank', 'George', 'Henry', 'Isaac',
+         'Jalen', 'Kyle', 'Lamar', 'Marcus', 'Nick', 'Odell', 'Patrick', 'Quinn', 'Russell',
+         'Stefon', 'Travis', 'Von', 'Will', 'Xavier', 'Zach')
+LAST = ('Allen', 'Brown', 'Carter', 'Davis', 'Evans', 'Fields', 'Green', 'Harris', 'Jackson',
+        'Johnson', 'King', 'Lewis', 'Mahomes', 'Nelson', 'Owens', 'Parker', 'Reed', 'Smith',
+        'Taylor', 'Watson', 'Young')
+
+STAT_GROUPS = [{'name': 'Passing', 'statistics': [{'name': 'yards', 'value': '4,183'},
+                                                  {'name': 'touchdowns', 'value': 27}]},
+               {'name': 'Rushing', 'statistics': [{'name': 'yards', 'value': 389}]}]
+
+
+def synthetic_league(num_teams, num_players, rng):
+    rosters = []
+    for t in range(num_teams):
+        team = {'id': t + 1, 'name': f'Team {t + 1}', 'city': f'City {t + 1}',
+                'coach': f'Coach {t + 1}', 'owner': f'Owner {t + 1}',
+                'stadium': f'Stadium {t + 1}', 'established': 1920 + t % 80,
+                'logo': f'https://example.com/teams/{t + 1}.png'}
+        players = []
+        for n in range(num_players):
+            group = GROUPS[n % 3]
+            players.append({'id': (t + 1) * 1000 + n,
+                            'name': f'{rng.choice(FIRST)} {rng.choice(LAST)} {t + 1}-{n}',
+                            'age': rng.randint(21, 38), 'height': "6' 2\"", 'weight': '220 lbs',
+                            'college': rng.choice(('LSU', 'Alabama', 'Ohio State', 'USC')),
+                            'group': group, 'position': rng.choice(POSITIONS[group]),
+                            'number': n, 'salary': '$1,000,000', 'experience': rng.randint(0, 15),
+                            'image': f'https://example.com/players/{t + 1}-{n}.png'})
+        rosters.append((team, players))
+    return rosters
+
+
+def seed(args, rng):
+    """Reset the schema and load teams, players, users and favorites."""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    load_rosters(synthetic_league(32 * args.scale, args.players, rng))
+
+    team_ids = [id for (id,) in db.session.query(flask_app.Team.id)]
+    player_ids = [id for (id,) in db.session.query(flask_app.Player.id)]
+
+    # one real hash shared by everyone; hashing thousands of passwords isn't what's measured
+    password = hasher.hash('benchmark')
+    db.session.execute(db.insert(User), [
+        {'id': u, 'username': f'user{u}', 'email': f'user{u}@example.com',
+         'password': password, 'image_url': '/static/default-pic.png'}
+        for u in range(1, args.users + 1)])
+    db.session.execute(db.insert(TeamFavorites), [
+        {'user_id': u, 'team_id': team_id}
+        for u in range(1, args.users + 1)
+        for team_id in rng.sample(team_ids, min(args.favorites // 4 + 1, len(team_ids)))])
+    db.session.execute(db.insert(PlayerFavorites), [
+        {'user_id': u, 'player_id': player_id}
+        for u in range(1, args.users + 1)
+        for player_id in rng.sample(player_ids, min(args.favorites, len(player_ids)))])
+    recount_favorites()
+    db.session.commit()
+    return team_ids, player_ids
+
+
+class StubApi(BaseHTTPRequestHandler):
+    """Stand-in for api-sports.io: every stats request gets the same stat groups."""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        data = json.dumps({'response': [{'teams': [{'groups': STAT_GROUPS}]}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_api(latency):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubApi)
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api.base_url = f'http://127.0.0.1:{server.server_port}'
+    return server
+
+
+class QueryCounter:
+    """SQL statements run by the current thread, counted per request."""
+
+    def __init__(self, engine):
+        self.local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self.count)
+
+    def count(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    def read(self):
+        return getattr(self.local, 'count', 0)
+
+
+def routes(team_ids, player_ids, user_ids, rng):
+    """(label, url factory) pairs; factories pick random ids so caches see a realistic spread."""
+    return [
+        ('home', lambda: '/'),
+        ('team', lambda: f'/teams/{rng.choice(team_ids)}'),
+        ('team offense', lambda: f'/teams/{rng.choice(team_ids)}/offense'),
+        ('depth chart', lambda: f'/teams/{rng.choice(team_ids)}/depth-chart'),
+        ('players', lambda: '/players'),
+        ('players search', lambda: f'/players?q={rng.choice(LAST)}'),
+        ('players popular', lambda: '/players?sort=popular'),
+        ('player profile', lambda: f'/players/{rng.choice(player_ids)}'),
+        ('player stats', lambda: f'/players/{rng.choice(player_ids)}/stats'),
+        ('user favorites', lambda: f'/users/{rng.choice(user_ids)}/players'),
+        ('leaderboard', lambda: '/leaderboard'),
+        ('api players', lambda: '/api/players?fields=name,position&limit=100'),
+    ]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(p * (len(ordered) - 1)))]
+
+
+def bench(url_for, args, counter, user_ids, rng):
+    """Run one route; return latency/query/throughput numbers."""
+    latencies, queries, statuses = [], [], {}
+    lock = threading.Lock()
+    per_thread = max(1, args.requests // args.concurrency)
+
+    def worker(seed):
+        local_rng = random.Random(seed)
+        client = app.test_client()
+        if args.logged_in:
+            with client.session_transaction() as sess:
+                sess[CURR_USER_KEY] = local_rng.choice(user_ids)
+        for i in range(args.warmup + per_thread):
+            url = url_for()
+            counter.reset()
+            start = time.perf_counter()
+            resp = client.get(url)
+            elapsed = time.perf_counter() - start
+            if i < args.warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                queries.append(counter.read())
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(rng.random(),)) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {'requests': len(latencies),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'queries_per_request': sum(queries) / len(queries),
+            # includes warmup time, so it slightly understates steady-state throughput
+            'requests_per_second': (args.warmup * args.concurrency + len(latencies)) / wall,
+            'statuses': statuses}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1, help='league size in multiples of 32 teams')
+    parser.add_argument('--players', type=int, default=53, help='players per team')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--favorites', type=int, default=10, help='favorite players per user')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per thread')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per route')
+    parser.add_argument('--api-latency', type=float, default=0.05,
+                        help='seconds the stub stats API takes to answer')
+    parser.add_argument('--logged-in', action='store_true', help='send requests as random users')
+    parser.add_argument('--routes', help='comma separated route labels to run (default: all)')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f'database: {db.engine.url.render_as_string(hide_password=True)}')
+    start = time.perf_counter()
+    team_ids, player_ids = seed(args, rng)
+    user_ids = list(range(1, args.users + 1))
+    print(f'seeded {len(team_ids)} teams, {len(player_ids)} players, {len(user_ids)} users '
+          f'in {time.perf_counter() - start:.1f}s')
+
+    stub = start_stub_api(args.api_latency)
+    counter = QueryCounter(db.engine)
+    wanted = args.routes and {label.strip() for label in args.routes.split(',')}
+
+    results = {}
+    print(f'{"route":>16} {"reqs":>6} {"p50 ms":>8} {"p99 ms":>8} {"queries":>8} {"req/s":>8}')
+    for label, url_for in routes(team_ids, player_ids, user_ids, rng):
+        if wanted and label not in wanted:
+            continue
+        r = results[label] = bench(url_for, args, counter, user_ids, rng)
+        errors = sum(count for status, count in r['statuses'].items() if status >= 400)
+        print(f'{label:>16} {r["requests"]:>6} {r["p50_ms"]:>8.2f} {r["p99_ms"]:>8.2f} '
+              f'{r["queries_per_request"]:>8.1f} {r["requests_per_second"]:>8.1f}'
+              + (f'  ({errors} errors)' if errors else ''))
+
+    stub.shutdown()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f'wrote {args.json}')
@@ -0,0 +1,148 @@
+"""Set-based loading of teams, players and team_players.
+
+Instead of adding and committing one Player at a time, rosters are staged as
+plain rows and written with batched `INSERT ... ON CONFLICT` executemany
+calls (or `COPY` into a staging table on PostgreSQL), all inside one
+transaction. Rows are matched on lookup_id, so loading the same data twice
+updates it in place.
+"""
+
+import csv
+import io
+
+from app import db
+from models import Team, Player, TeamPlayers, DataVersion, ROSTERS, dialect_insert
+
+PLAYER_COLUMNS = ['name', 'age', 'height', 'weight', 'college', 'group', 'position',
+                  'number', 'salary', 'seasons', 'image_url', 'lookup_id']
+
+
+def team_fields(team):
+    """Team columns from an API team."""
+    return {'name': team['name'],
+            'city': team['city'],
+            'coach': team['coach'],
+            'owner': team['owner'],
+            'stadium': team['stadium'],
+            'established': team['established'],
+            'logo': team['logo'],
+            'lookup_id': team['id']}
+
+
+def player_fields(player):
+    """Player columns from an API player."""
+    return {'name': player['name'],
+            'age': player['age'],
+            'height': player['height'],
+            'weight': player['weight'],
+            'college': player['college'],
+            'group': player['group'],
+            'position': player['position'],
+            'number': player['number'],
+            'salary': player['salary'],
+            'seasons': player['experience'],
+            'image_url': player['image'],
+            'lookup_id': player['id']}
+
+
+def batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def without_nones(fields):
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+def stage(rosters):
+    """Turn (team, players) API pairs into team rows, player rows and lookup_id pairs."""
+    teams, players, memberships = {}, {}, []
+    for team, roster in rosters:
+        # let column defaults fill in anything the API left out
+        teams[team['id']] = without_nones(team_fields(team))
+        for player in roster:
+            players[player['id']] = without_nones(player_fields(player))
+            memberships.append((team['id'], player['id']))
+    return list(teams.values()), list(players.values()), memberships
+
+
+def upsert(model, rows, batch_size):
+    """INSERT ... ON CONFLICT (lookup_id) DO UPDATE, executed batch_size rows at a time."""
+    for batch in batches(rows, batch_size):
+        # rows executed together must share the same keys
+        by_keys = {}
+        for row in batch:
+            by_keys.setdefault(tuple(row), []).append(row)
+        for keys, same in by_keys.items():
+            stmt = dialect_insert(model)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['lookup_id'],
+                set_={key: stmt.excluded[key] for key in keys if key != 'lookup_id'})
+            db.session.execute(stmt, same)
+
+
+def copy_players(rows):
+    """Load player rows with COPY into a temp table, then upsert them in one statement."""
+    conn = db.session.connection()
+    cols = ', '.join(f'"{col}"' for col in PLAYER_COLUMNS)
+    updates = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in PLAYER_COLUMNS if col != 'lookup_id')
+
+    conn.exec_driver_sql('CREATE TEMP TABLE staging_players '
+                         '(LIKE players INCLUDING DEFAULTS) ON COMMIT DROP')
+
+    # COPY writes NULL for missing values, so fill in the column defaults here
+    defaults = {col: Player.__table__.c[col].default.arg
+                for col in PLAYER_COLUMNS if Player.__table__.c[col].default is not None}
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([row.get(col, defaults.get(col)) for col in PLAYER_COLUMNS])
+    buf.seek(0)
+
+    cursor = conn.connection.driver_connection.cursor()
+    cursor.copy_expert(f'COPY staging_players ({cols}) FROM STDIN WITH (FORMAT csv)', buf)
+
+    conn.exec_driver_sql(f'INSERT INTO players ({cols}) SELECT {cols} FROM staging_players '
+                         f'ON CONFLICT (lookup_id) DO UPDATE SET {updates}')
+
+
+def id_map(model, lookup_ids):
+    ids = {}
+    for batch in batches(list(lookup_ids), 1000):
+        ids.update(db.session.query(model.lookup_id, model.id).filter(model.lookup_id.in_(batch)))
+    return ids
+
+
+def load_rosters(rosters, batch_size=500, use_copy=None):
+    """Write every team, player and roster membership in `rosters` in one transaction.
+
+    use_copy: load players with COPY; defaults to True on PostgreSQL.
+    Returns the number of (teams, players, memberships) staged.
+    """
+    teams, players, memberships = stage(rosters)
+    if use_copy is None:
+        use_copy = db.engine.dialect.name == 'postgresql'
+
+    try:
+        upsert(Team, teams, batch_size)
+        if use_copy and players:
+            copy_players(players)
+        else:
+            upsert(Player, players, batch_size)
+
+        team_ids = id_map(Team, {team_id for team_id, _ in memberships})
+        player_ids = id_map(Player, {player_id for _, player_id in memberships})
+        rows = [{'team_id': team_ids[team_id], 'player_id': player_ids[player_id]}
+                for team_id, player_id in memberships]
+        for batch in batches(rows, batch_size):
+            db.session.execute(dialect_insert(TeamPlayers).on_conflict_do_nothing(), batch)
+
+        # cached team pages (fragment_cache.py) go stale once this commits
+        DataVersion.bump(ROSTERS)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(teams), len(players), len(memberships)
@@ -0,0 +1,125 @@
+"""Cache of rendered HTML for pages that only change when rosters do.
+
+The home page and team pages are rendered once per route and roster data
+version (DataVersion 'rosters', bumped by seed/sync and by ORM edits to
+teams or rosters) and served from memory after that. The cached HTML is
+the anonymous part of the page: favorite buttons are left as
+<!--favorite-team:ID--> / <!--favorite-player:ID--> markers and filled in
+per request by fill_favorites, and the nav bar and flashed messages are
+rendered around it as usual.
+
+Bumps made by another process are noticed within `version_ttl` seconds;
+commits in this process that change rosters are noticed straight away.
+"""
+
+import re
+import threading
+import time
+import weakref
+
+from flask import g, render_template
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import DataVersion, ROSTERS
+from stats_cache import MemoryBackend
+
+FAVORITE_MARKER = re.compile(r'<!--favorite-(team|player):(\d+)-->')
+BUTTON_TEMPLATES = {'team': 'teams/favorite-button.html',
+                    'player': 'players/favorite-button.html'}
+PLACEHOLDER_ID = '__id__'
+
+_caches = weakref.WeakSet()
+
+
+class FragmentCache:
+    """LRU of rendered HTML keyed on (key, current data version)."""
+
+    def __init__(self, max_entries=512, version_ttl=5, name=ROSTERS, clock=time.monotonic):
+        self.memory = MemoryBackend(max_entries)
+        self.version_ttl = version_ttl
+        self.name = name
+        self.clock = clock
+        self._state = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0}
+        _caches.add(self)
+
+    def current(self):
+        """(version, updated_at), re-read from the database at most every version_ttl seconds."""
+        now = self.clock()
+        state = self._state
+        if state is None or now - self._checked_at >= self.version_ttl:
+            state = self._state = DataVersion.current(self.name)
+            self._checked_at = now
+        return state
+
+    def version(self):
+        """Token that changes with the data: (version, updated_at).
+
+        The counter alone isn't enough, since seed.py drops data_versions
+        with everything else and a full reseed can end on the same number.
+        """
+        return self.current()
+
+    def expire_version(self):
+        self._state = None
+
+    def get_or_render(self, key, render):
+        """Cached HTML for `key`, calling render() to build it on a miss."""
+        full_key = (key, self.version())
+        entry = self.memory.get(full_key)
+        if entry is not None:
+            self._count('hits')
+            return entry[0]
+
+        html = render()
+        self.memory.set(full_key, html, self.clock())
+        self._count('misses')
+        return html
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def clear(self):
+        self.memory.clear()
+        self.expire_version()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['entries'] = len(self.memory)
+        return stats
+
+
+@event.listens_for(Session, 'after_commit')
+def expire_versions(session):
+    if session.info.pop('data_changed', False):
+        for cache in list(_caches):
+            cache.expire_version()
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('data_changed', None)
+
+
+def fill_favorites(html):
+    """Replace favorite markers with buttons for the logged-in user, or drop them."""
+    if not g.user:
+        return FAVORITE_MARKER.sub('', html)
+
+    buttons = {}
+
+    def button(match):
+        kind, id = match.groups()
+        ids = g.favorite_team_ids if kind == 'team' else g.favorite_player_ids
+        favorite = int(id) in ids
+        if (kind, favorite) not in buttons:
+            buttons[kind, favorite] = render_template(BUTTON_TEMPLATES[kind],
+                                                      id=PLACEHOLDER_ID, favorite=favorite)
+        return buttons[kind, favorite].replace(PLACEHOLDER_ID, id)
+
+    return FAVORITE_MARKER.sub(button, html)
@@ -0,0 +1,42 @@
+"""Split a roster into its groups in a single pass.
+
+Rosters come out of the database already sorted by name, so grouping keeps
+that order inside each group. The three standard NFL groups are always
+present (possibly empty) and come first; any other group value the API
+hands back gets its own section after them instead of being dropped.
+"""
+
+from operator import attrgetter
+
+GROUPS = ('Offense', 'Defense', 'Special Teams')
+OTHER = 'Other'
+
+
+def group_by(items, key, keys=()):
+    """Dict of key(item) -> [items], in one pass, preserving input order.
+
+    `keys` are added first, in order, even when nothing falls into them.
+    Items whose key is None are collected under OTHER.
+    """
+    groups = {k: [] for k in keys}
+    for item in items:
+        k = key(item)
+        if k is None:
+            k = OTHER
+        bucket = groups.get(k)
+        if bucket is None:
+            bucket = groups[k] = []
+        bucket.append(item)
+    return groups
+
+
+def group_players(players):
+    """Players split into Offense, Defense, Special Teams and any other groups."""
+    return group_by(players, attrgetter('group'), GROUPS)
+
+
+def depth_chart(players):
+    """Players grouped by group, then by position within each group."""
+    by_position = attrgetter('position')
+    return {group: group_by(members, by_position)
+            for group, members in group_players(players).items()}
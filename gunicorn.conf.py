@@ -0,0 +1,15 @@
+import os
+
+# Threaded workers, so a request waiting on the stats API (or on another
+# request's in-flight call for the same player) doesn't hold a whole worker.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+
+def post_worker_init(worker):
+    # build the roster snapshot before the first request rather than during it
+    from app import app, rosters
+    with app.app_context():
+        rosters.get()
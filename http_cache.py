@@ -0,0 +1,87 @@
+"""ETag / Last-Modified validators and 304 responses for read-only pages.
+
+A page's ETag is derived from things the server already knows without
+rendering it: the request path and query string, the roster data version
+and the time of its last bump, and for logged-in users their id and
+session_version (which is bumped on every favorite change and profile
+edit). A conditional GET that still matches is answered with 304 before
+the view runs at all.
+
+Anonymous responses also get a Last-Modified from the time of the last
+roster bump. Logged-in responses don't, since the user's favorites can
+change after that time.
+"""
+
+import hashlib
+import os
+from functools import wraps
+
+from flask import g, request, session, make_response
+from werkzeug.http import is_resource_modified
+
+
+def tree_mtime(*dirs):
+    """Latest modification time of any file under `dirs`, as an int."""
+    latest = 0
+    for top in dirs:
+        for root, _, files in os.walk(top):
+            for name in files:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return int(latest)
+
+
+class ConditionalGet:
+    """Decorator source for views whose output only depends on roster data and g.user.
+
+    versions: anything with a current() -> (version, updated_at) method,
+        e.g. the FragmentCache.
+    salt: mixed into every ETag so a deploy that changes templates or
+        static files invalidates what browsers hold.
+    """
+
+    def __init__(self, versions, salt=''):
+        self.versions = versions
+        self.salt = salt
+
+    def validators(self):
+        """(etag, last_modified) for the current request."""
+        version, updated_at = self.versions.current()
+        user = g.get('user')
+        viewer = f'user:{user.id}:{user.session_version}' if user else 'anon'
+        key = f'{self.salt}|{version}|{updated_at}|{viewer}|{request.full_path}'
+        etag = hashlib.sha1(key.encode()).hexdigest()
+        return etag, None if user else updated_at
+
+    def conditional(self, view=None, *, unless=None):
+        """Answer matching conditional GETs to `view` with 304.
+
+        unless: optional no-argument predicate; requests it returns True for
+            depend on something the ETag doesn't cover, so they always run
+            the view and get no validators.
+        """
+        if view is None:
+            return lambda view: self.conditional(view, unless=unless)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # flashed messages are shown once, so that page can't be reused
+            if '_flashes' in session or (unless is not None and unless()):
+                return view(*args, **kwargs)
+
+            etag, last_modified = self.validators()
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # always revalidate; shared caches must key on the session cookie
+            response.cache_control.no_cache = True
+            response.cache_control.private = g.get('user') is not None
+            response.vary.add('Cookie')
+            return response
+        return wrapper
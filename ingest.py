@@ -0,0 +1,208 @@
+"""Rate-limited, concurrent loading of teams and rosters from api-sports.io.
+
+Roster requests run on a small thread pool and share one token bucket that
+is kept in step with the quota headers the API sends back, so a reseed goes
+as fast as the account's quota allows. Database writes stay on the calling
+thread, one transaction per team.
+
+`seed` fills an empty database. `sync` updates a live one in place, matching
+rows by lookup_id, so users' favorites survive a roster refresh.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app import db, api, YEAR
+from api_client import response_list
+from models import Team, Player, TeamPlayers, DataVersion, ROSTERS
+from bulk_load import team_fields, player_fields, load_rosters
+
+# free api-sports plans allow 10 requests a minute
+DEFAULT_PER_MINUTE = 10
+
+
+class TokenBucket:
+    """Token bucket shared by all fetcher threads.
+
+    rate: tokens added per second.
+    capacity: most tokens that can be saved up for a burst.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _fill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                self._fill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Match the bucket to the per-minute quota reported by the API."""
+        limit = headers.get('X-RateLimit-Limit')
+        remaining = headers.get('X-RateLimit-Remaining')
+        with self.lock:
+            self._fill()
+            if limit and int(limit) > 0:
+                self.rate = int(limit) / 60
+                self.capacity = int(limit)
+            if remaining is not None:
+                self.tokens = min(self.tokens, int(remaining))
+
+
+class QuotaExhausted(Exception):
+    """The API reports no requests left for today."""
+
+
+def api_get(path, params, bucket):
+    """GET an API endpoint once the bucket allows it and return its 'response' list.
+
+    An 'errors' body raises ApiError (see api_client.response_list).
+    """
+    bucket.acquire()
+    res = api.get(path, params)
+    bucket.update_from_headers(res.headers)
+    if res.headers.get('x-ratelimit-requests-remaining') == '0':
+        raise QuotaExhausted(f'daily API quota used up while fetching {path}')
+    return response_list(res, path)
+
+
+def fetch_teams(bucket, season=YEAR):
+    """League teams, skipping the conference entries that have no city."""
+    teams = api_get('teams', {'league': 1, 'season': season}, bucket)
+    return [team for team in teams if team['city'] is not None]
+
+
+def fetch_rosters(teams, bucket, season=YEAR, workers=4):
+    """Yield (team, players) pairs as each roster request finishes."""
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(api_get, 'players', {'team': team['id'], 'season': season}, bucket): team
+                   for team in teams}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # after a failure (e.g. QuotaExhausted) don't spend requests on the teams still queued
+        pool.shutdown(cancel_futures=True)
+
+
+def team_from_api(team):
+    return Team(**team_fields(team))
+
+
+def player_from_api(player):
+    return Player(**player_fields(player))
+
+
+def seed(season=YEAR, workers=4, per_minute=DEFAULT_PER_MINUTE):
+    """Load every team and roster into an empty database."""
+    bucket = TokenBucket(rate=per_minute / 60, capacity=per_minute)
+    teams = fetch_teams(bucket, season)
+
+    for num, (team, players) in enumerate(fetch_rosters(teams, bucket, season, workers), start=1):
+        load_rosters([(team, players)])
+        print(f"{num}/{len(teams)} {team['name']}: {len(players)} players")
+
+
+def apply_changes(obj, fields):
+    """Set only the attributes whose values differ. Return True if any did.
+
+    Missing (None) values from the API are skipped, since on insert they were
+    replaced by the column default.
+    """
+    changed = False
+    for key, value in fields.items():
+        if value is not None and getattr(obj, key) != value:
+            setattr(obj, key, value)
+            changed = True
+    return changed
+
+
+def sync_team(team, players, counts):
+    """Upsert one team and its players and reconcile its team_players rows.
+
+    An empty roster is far more likely a bad API reply than a team that cut
+    everyone, so the team is skipped (and None returned) instead of emptied.
+    """
+    if not players:
+        print(f"skipping {team['name']}: the API returned no players")
+        return None
+
+    t = Team.query.filter_by(lookup_id=team['id']).first()
+    if t is None:
+        t = team_from_api(team)
+        db.session.add(t)
+        counts['teams_added'] += 1
+    elif apply_changes(t, team_fields(team)):
+        counts['teams_updated'] += 1
+
+    lookup_ids = [player['id'] for player in players]
+    existing = {p.lookup_id: p for p in Player.query.filter(Player.lookup_id.in_(lookup_ids))}
+
+    roster = []
+    for player in players:
+        p = existing.get(player['id'])
+        if p is None:
+            p = player_from_api(player)
+            db.session.add(p)
+            counts['players_added'] += 1
+        elif apply_changes(p, player_fields(player)):
+            counts['players_updated'] += 1
+        roster.append(p)
+    db.session.flush()
+
+    wanted = {p.id for p in roster}
+    current = {player_id for (player_id,) in
+               db.session.query(TeamPlayers.player_id).filter(TeamPlayers.team_id == t.id)}
+
+    removed = current - wanted
+    if removed:
+        TeamPlayers.query.filter(TeamPlayers.team_id == t.id,
+                                 TeamPlayers.player_id.in_(removed)).delete(synchronize_session=False)
+    added = wanted - current
+    if added:
+        db.session.execute(db.insert(TeamPlayers), [{'team_id': t.id, 'player_id': player_id}
+                                                    for player_id in added])
+    counts['roster_added'] += len(added)
+    counts['roster_removed'] += len(removed)
+
+    if removed or added:
+        DataVersion.bump(ROSTERS)
+    db.session.commit()
+    return t
+
+
+def sync(season=YEAR, workers=4, per_minute=DEFAULT_PER_MINUTE):
+    """Bring an existing database up to date with the API without dropping anything.
+
+    Players who are no longer on any roster keep their row (and any user
+    favorites); only their team membership is removed.
+    """
+    bucket = TokenBucket(rate=per_minute / 60, capacity=per_minute)
+    teams = fetch_teams(bucket, season)
+    counts = dict.fromkeys(['teams_added', 'teams_updated', 'players_added', 'players_updated',
+                            'roster_added', 'roster_removed'], 0)
+
+    for num, (team, players) in enumerate(fetch_rosters(teams, bucket, season, workers), start=1):
+        sync_team(team, players, counts)
+        print(f"{num}/{len(teams)} {team['name']}: {len(players)} players")
+
+    print(', '.join(f'{key.replace("_", " ")}: {value}' for key, value in counts.items()))
+    return counts
@@ -0,0 +1,65 @@
+"""Fetch stats for every player once and store them in player_statistics.
+
+    $ python3.12 ingest_stats.py [--season 2023] [--per-minute 10]
+
+Requests are paced by the same quota-following token bucket as seed.py.
+Players whose request fails are skipped and listed at the end; if the daily
+quota runs out the run stops there.
+"""
+
+import argparse
+import time
+
+from app import db, api, YEAR
+from api_client import ApiError, CircuitOpen
+from ingest import TokenBucket, QuotaExhausted, api_get, DEFAULT_PER_MINUTE
+from models import Player, PlayerStatistic
+
+
+def ingest_stats(season=YEAR, per_minute=DEFAULT_PER_MINUTE):
+    """Upsert stats for all players, committing after each player.
+
+    Returns (stats stored, lookup_ids of players that couldn't be fetched).
+    """
+    bucket = TokenBucket(rate=per_minute / 60, capacity=per_minute)
+    players = db.session.query(Player.id, Player.lookup_id).filter(Player.lookup_id.isnot(None)).all()
+    stored = 0
+    failed = []
+
+    for num, (player_id, lookup_id) in enumerate(players, start=1):
+        try:
+            res = api_get('players/statistics', {'id': lookup_id, 'season': season}, bucket)
+        except QuotaExhausted as e:
+            print(f'\n{e}; stopping')
+            failed.extend(lookup_id for _, lookup_id in players[num - 1:])
+            break
+        except CircuitOpen:
+            failed.append(lookup_id)
+            # wait for the breaker to let a trial through instead of skipping everyone left
+            time.sleep(api.breaker.reset_timeout)
+            continue
+        except ApiError as e:
+            print(f'\nplayer {lookup_id}: {e}')
+            failed.append(lookup_id)
+            continue
+
+        stat_groups = res[0]['teams'][0]['groups'] if res else None
+        stored += PlayerStatistic.upsert_groups(player_id, season, stat_groups)
+        db.session.commit()
+        print(f'{num}/{len(players)} players, {stored} stats stored', end='\r')
+
+    print()
+    if failed:
+        print(f'{len(failed)} players not fetched: {", ".join(map(str, failed))}')
+    return stored, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--season', type=int, default=YEAR)
+    parser.add_argument('--per-minute', type=int, default=DEFAULT_PER_MINUTE,
+                        help='starting request quota; corrected from the API response headers')
+    args = parser.parse_args()
+
+    db.create_all()
+    ingest_stats(args.season, args.per_minute)
@@ -0,0 +1,70 @@
+"""Bring an existing database's schema up to date without dropping any data.
+
+    $ python3.12 migrate.py
+
+Creates tables that don't exist yet, adds columns and indexes declared in
+models.py that are missing, and recounts the favorite_count columns. Safe
+to run again; anything already there is skipped.
+"""
+
+from app import db
+from models import recount_favorites
+
+
+def add_missing_columns():
+    """ALTER TABLE ... ADD COLUMN for declared columns the database doesn't have yet.
+
+    Columns are only made NOT NULL when they have a server default to fill
+    existing rows with.
+    """
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = (f'ALTER TABLE {preparer.format_table(table)} '
+                       f'ADD COLUMN {preparer.format_column(column)} '
+                       f'{column.type.compile(dialect=db.engine.dialect)}')
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                    if not column.nullable:
+                        ddl += ' NOT NULL'
+                conn.exec_driver_sql(ddl)
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def index_names():
+    inspector = db.inspect(db.engine)
+    return {index['name'] for table in db.metadata.sorted_tables
+            for index in inspector.get_indexes(table.name)}
+
+
+def create_missing_indexes():
+    """Create declared indexes that aren't in the database yet. Return their names."""
+    before = index_names()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            # checkfirst also skips indexes declared for another database (ddl_if)
+            index.create(db.engine, checkfirst=True)
+    return sorted(index_names() - before)
+
+
+def migrate():
+    """Apply everything missing; return a list of what was added."""
+    db.create_all()
+    columns = add_missing_columns()
+    indexes = create_missing_indexes()
+    # counters added to a database that already has favorites start at zero
+    recount_favorites()
+    db.session.commit()
+    return [f'column {name}' for name in columns] + [f'index {name}' for name in indexes]
+
+
+if __name__ == '__main__':
+    added = migrate()
+    print('\n'.join(f'added {name}' for name in added) or 'schema already up to date')
@@ -1,9 +1,27 @@
-from flask_bcrypt import Bcrypt
+from datetime import datetime, timezone
+from itertools import chain
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from passwords import hasher
+from auth import verify_password
 
-bcrypt = Bcrypt()
 db = SQLAlchemy()
 
+# search.py's trigram indexes need this extension on PostgreSQL
+event.listen(db.metadata, 'before_create',
+             db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
+
+def trigram_index(name, column):
+    """GIN trigram index for fuzzy/ILIKE search; only created on PostgreSQL."""
+    return db.Index(name, column, postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+
+
 def connect_db(app):
     """Connect this database to provided Flask app.
     """
@@ -12,10 +30,43 @@ def connect_db(app):
     db.init_app(app)
 
 
+def dialect_insert(model):
+    """INSERT for `model` that supports on_conflict_do_* on PostgreSQL and SQLite."""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+class FavoriteCount:
+    """favorite_count kept in step with a favorites table by User.set_favorites."""
+
+    # number of users who favorited this; see recount_favorites
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @classmethod
+    def adjust_favorite_counts(cls, ids, delta):
+        if ids:
+            db.session.execute(db.update(cls)
+                               .where(cls.id.in_(ids))
+                               .values(favorite_count=cls.favorite_count + delta))
+
+    @classmethod
+    def most_favorited(cls, limit):
+        """The `limit` most favorited rows, most first."""
+        return (cls.query
+                .filter(cls.favorite_count > 0)
+                .order_by(cls.favorite_count.desc(), cls.id.desc())
+                .limit(limit)
+                .all())
+
+
 class User(db.Model):
     """User in the system."""
 
     __tablename__ = 'users'
+    __table_args__ = (
+        trigram_index('ix_users_username_trgm', 'username'),
+    )
 
     id = db.Column(db.Integer,primary_key=True, autoincrement=True)
 
@@ -27,6 +78,9 @@ class User(db.Model):
 
     image_url = db.Column(db.Text, default="/static/default-pic.png")
 
+    # bumped whenever cached copies of this user (session, pages) must be refreshed
+    session_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
     favorite_teams = db.relationship('Team', secondary='favorite_teams', backref='users')
 
     favorite_players = db.relationship('Player', secondary='favorite_players', backref='users')
@@ -38,12 +92,10 @@ class User(db.Model):
     def register(cls, username, email, pwd, image_url):
         """Register user w/hashed password & return user."""
 
-        hashed = bcrypt.generate_password_hash(pwd)
-        # turn bytestring into normal (unicode utf8) string
-        hashed_utf8 = hashed.decode("utf8")
+        hashed = hasher.hash(pwd)
 
         # return instance of user w/username and hashed pwd
-        user = User(username=username, email=email, password=hashed_utf8, image_url=image_url)
+        user = User(username=username, email=email, password=hashed, image_url=image_url)
 
         db.session.add(user)
         return user
@@ -52,34 +104,124 @@ class User(db.Model):
     def authenticate(cls, username, pwd):
         """Validate that user exists & password is correct.
 
-        Return user if valid; else return False.
+        Return user if valid; else return False. A password hashed at an
+        old cost factor is rehashed at the current one (commit pending).
         """
 
         u = User.query.filter_by(username=username).first()
 
-        if u and bcrypt.check_password_hash(u.password, pwd):
-            # return user instance
+        # a missing user still costs one bcrypt check, like a wrong password
+        if verify_password(u, pwd):
+            if hasher.needs_rehash(u.password):
+                u.password = hasher.hash(pwd)
+            # return instance of user
             return u
         else:
             return False
         
+    @classmethod
+    def favorite_ids_for(cls, user_id):
+        """(team_ids, player_ids) favorited by a user, loaded in one query."""
+        teams = db.select(db.literal('team').label('kind'), TeamFavorites.team_id.label('id')).where(
+            TeamFavorites.user_id == user_id)
+        players = db.select(db.literal('player').label('kind'), PlayerFavorites.player_id.label('id')).where(
+            PlayerFavorites.user_id == user_id)
+
+        ids = {'team': set(), 'player': set()}
+        for kind, id in db.session.execute(db.union_all(teams, players)):
+            ids[kind].add(id)
+        return ids['team'], ids['player']
+
+    @classmethod
+    def set_favorites(cls, user_id, teams=None, players=None):
+        """Apply {id: favorite?} changes for a user's teams and players (commit pending).
+
+        Adds are one INSERT ... SELECT ... ON CONFLICT DO NOTHING per table, so
+        repeats and ids that don't exist are skipped; removes are one DELETE.
+        Only rows actually inserted or deleted change favorite_count. The
+        favorites relationships are never loaded.
+        """
+        for table, column, model, changes in (
+                (TeamFavorites, TeamFavorites.team_id, Team, teams),
+                (PlayerFavorites, PlayerFavorites.player_id, Player, players)):
+            if not changes:
+                continue
+            added = [id for id, favorite in changes.items() if favorite]
+            removed = [id for id, favorite in changes.items() if not favorite]
+            if added:
+                rows = db.select(db.literal(user_id), model.id).where(model.id.in_(added))
+                inserted = db.session.execute(dialect_insert(table)
+                                              .from_select(['user_id', column.key], rows)
+                                              .on_conflict_do_nothing()
+                                              .returning(column)).scalars().all()
+                model.adjust_favorite_counts(inserted, 1)
+            if removed:
+                deleted = db.session.execute(db.delete(table)
+                                             .where(table.user_id == user_id, column.in_(removed))
+                                             .returning(column)).scalars().all()
+                model.adjust_favorite_counts(deleted, -1)
+
+    @classmethod
+    def clear_favorites(cls, user_id):
+        """Remove all of a user's favorites, keeping the favorite counts right (commit pending)."""
+        team_ids, player_ids = cls.favorite_ids_for(user_id)
+        cls.set_favorites(user_id,
+                          teams=dict.fromkeys(team_ids, False),
+                          players=dict.fromkeys(player_ids, False))
+
+    @classmethod
+    def bump_session_version(cls, user_id):
+        """Increment a user's session_version without loading the row. Return the new version."""
+        return db.session.execute(
+            db.update(cls)
+            .where(cls.id == user_id)
+            .values(session_version=cls.session_version + 1)
+            .returning(cls.session_version)).scalar()
+
+    def load_favorite_ids(self):
+        """Load the ids of every favorited team and player in one query.
+
+        Returns (team_ids, player_ids) as sets and keeps them on this instance
+        so later favorite checks don't touch the database.
+        """
+        self._favorite_ids = User.favorite_ids_for(self.id)
+        return self._favorite_ids
+
+    @property
+    def favorite_team_ids(self):
+        if 'favorite_teams' in self.__dict__:
+            # relationship already loaded (and possibly changed) this request
+            return {team.id for team in self.favorite_teams}
+        if getattr(self, '_favorite_ids', None) is None:
+            self.load_favorite_ids()
+        return self._favorite_ids[0]
+
+    @property
+    def favorite_player_ids(self):
+        if 'favorite_players' in self.__dict__:
+            return {player.id for player in self.favorite_players}
+        if getattr(self, '_favorite_ids', None) is None:
+            self.load_favorite_ids()
+        return self._favorite_ids[1]
+
     def is_favorite_team(self, other_team):
         """Has this user favorited `other_team`?"""
 
-        found_team_list = [team for team in self.favorite_teams if team == other_team]
-        return len(found_team_list) == 1
+        return other_team.id in self.favorite_team_ids
 
     def is_favorite_player(self, other_player):
         """has this user favorited `other_player`?"""
 
-        found_player_list = [player for player in self.favorite_players if player.id == other_player.id]
-        return len(found_player_list) == 1
+        return other_player.id in self.favorite_player_ids
 
     
 
-class Team(db.Model):
+class Team(FavoriteCount, db.Model):
     """Team in the system"""
     __tablename__= 'teams'
+    __table_args__ = (
+        trigram_index('ix_teams_name_trgm', 'name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
@@ -95,7 +237,7 @@ class Team(db.Model):
     
     established = db.Column(db.Integer)
 
-    lookup_id = db.Column(db.Integer)
+    lookup_id = db.Column(db.Integer, unique=True, index=True)
 
     logo = db.Column(db.Text, default='/static/default-pic.png')
 
@@ -108,16 +250,25 @@ class TeamFavorites(db.Model):
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='cascade'), primary_key=True)
 
-    team_id = db.Column(db.Integer, db.ForeignKey('teams.id', ondelete='cascade'), primary_key=True)
+    # the primary key only covers lookups by user_id
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id', ondelete='cascade'), primary_key=True, index=True)
 
     
-class Player(db.Model):
+class Player(FavoriteCount, db.Model):
     """Player in the system"""
     __tablename__= 'players'
+    __table_args__ = (
+        # roster pages filter on group and sort by name
+        db.Index('ix_players_group_name', 'group', 'name'),
+        trigram_index('ix_players_name_trgm', 'name'),
+        trigram_index('ix_players_college_trgm', 'college'),
+        # /players?sort=popular and the leaderboard read this index backwards
+        db.Index('ix_players_favorite_count_id', 'favorite_count', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
-    name = db.Column(db.Text, nullable=False)
+    name = db.Column(db.Text, nullable=False, index=True)
 
     age = db.Column(db.Integer)
 
@@ -139,10 +290,16 @@ class Player(db.Model):
 
     image_url = db.Column(db.Text, default='/static/default-pic.png')
 
-    lookup_id = db.Column(db.Integer)
-
-
+    lookup_id = db.Column(db.Integer, unique=True, index=True)
 
+    @classmethod
+    def favorites_of(cls, user_id):
+        """A user's favorite players ordered by name."""
+        return (cls.query
+                .join(PlayerFavorites, PlayerFavorites.player_id == cls.id)
+                .filter(PlayerFavorites.user_id == user_id)
+                .order_by(cls.name.asc())
+                .all())
 
 
 class PlayerFavorites(db.Model):
@@ -151,7 +308,8 @@ class PlayerFavorites(db.Model):
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='cascade'), primary_key=True)
 
-    player_id = db.Column(db.Integer, db.ForeignKey('players.id', ondelete='cascade'), primary_key=True)
+    # the primary key only covers lookups by user_id
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id', ondelete='cascade'), primary_key=True, index=True)
 
 
 class TeamPlayers(db.Model):
@@ -160,4 +318,149 @@ class TeamPlayers(db.Model):
 
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id', ondelete='cascade'), primary_key=True)
 
-    player_id = db.Column(db.Integer, db.ForeignKey('players.id', ondelete='cascade'), primary_key=True)
\ No newline at end of file
+    # reverse lookup for a player's teams; the primary key leads with team_id
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id', ondelete='cascade'), primary_key=True, index=True)
+
+
+class CachedPlayerStats(db.Model):
+    """Shared cache of stat groups fetched from the API"""
+    __tablename__= 'player_stats_cache'
+
+    lookup_id = db.Column(db.Integer, primary_key=True)
+
+    season = db.Column(db.Integer, primary_key=True)
+
+    payload = db.Column(db.JSON)
+
+    # unix timestamp of when the payload was fetched
+    fetched_at = db.Column(db.Float, nullable=False)
+
+
+class PlayerStatistic(db.Model):
+    """One stat value for a player in a season, e.g. Passing / yards / 4,183"""
+    __tablename__= 'player_statistics'
+    __table_args__ = (
+        db.UniqueConstraint('player_id', 'season', 'group', 'name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id', ondelete='cascade'), nullable=False)
+
+    season = db.Column(db.Integer, nullable=False)
+
+    group = db.Column(db.Text, nullable=False)
+
+    name = db.Column(db.Text, nullable=False)
+
+    value = db.Column(db.Text)
+
+    @classmethod
+    def groups_for(cls, player_id, season):
+        """Stored stats for a player shaped like the API's stat groups, or None."""
+        rows = (db.session.query(cls.group, cls.name, cls.value)
+                .filter(cls.player_id == player_id, cls.season == season)
+                .order_by(cls.id)
+                .all())
+        if not rows:
+            return None
+
+        groups = {}
+        for group, name, value in rows:
+            groups.setdefault(group, []).append({'name': name, 'value': value})
+        return [{'name': group, 'statistics': stats} for group, stats in groups.items()]
+
+    @classmethod
+    def upsert_groups(cls, player_id, season, stat_groups):
+        """Insert or update every stat in `stat_groups` for a player/season."""
+        rows = [{'player_id': player_id,
+                 'season': season,
+                 'group': group['name'],
+                 'name': stat['name'],
+                 'value': None if stat['value'] is None else str(stat['value'])}
+                for group in stat_groups or []
+                for stat in group['statistics']]
+        if not rows:
+            return 0
+
+        stmt = dialect_insert(cls)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['player_id', 'season', 'group', 'name'],
+            set_={'value': stmt.excluded.value})
+        db.session.execute(stmt, rows)
+        return len(rows)
+
+
+class DataVersion(db.Model):
+    """Counter bumped whenever a set of data changes, e.g. 'rosters' on reseed/sync.
+
+    Caches key on it, so a bump makes every cached copy of that data stale.
+    """
+    __tablename__= 'data_versions'
+
+    name = db.Column(db.Text, primary_key=True)
+
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime(timezone=True))
+
+    @classmethod
+    def current(cls, name):
+        """(version, updated_at) for `name`; (0, None) if it was never bumped."""
+        row = db.session.query(cls.version, cls.updated_at).filter_by(name=name).first()
+        if row is None:
+            return 0, None
+        return row.version, row.updated_at
+
+    @classmethod
+    def bump_statement(cls, name):
+        now = datetime.now(timezone.utc)
+        stmt = dialect_insert(cls).values(name=name, version=1, updated_at=now)
+        return stmt.on_conflict_do_update(index_elements=['name'],
+                                          set_={'version': cls.__table__.c.version + 1,
+                                                'updated_at': now})
+
+    @classmethod
+    def bump(cls, name):
+        """Bump a version as part of the current transaction."""
+        db.session.execute(cls.bump_statement(name))
+        db.session.info['data_changed'] = True
+
+
+ROSTERS = 'rosters'
+
+
+def recount_favorites():
+    """Recompute every favorite_count from the favorites tables (commit pending)."""
+    for model, table, column in ((Team, TeamFavorites, TeamFavorites.team_id),
+                                 (Player, PlayerFavorites, PlayerFavorites.player_id)):
+        count = (db.select(db.func.count())
+                 .select_from(table)
+                 .where(column == model.id)
+                 .scalar_subquery())
+        db.session.execute(db.update(model).values(favorite_count=count))
+
+
+def changes_roster(session, obj):
+    """Does this pending change alter what roster pages show?
+
+    Favoriting touches the users backrefs on Team and Player, which does
+    not count.
+    """
+    if isinstance(obj, TeamPlayers):
+        return True
+    if isinstance(obj, (Team, Player)):
+        if obj in session.new or obj in session.deleted:
+            return True
+        collection = 'players' if isinstance(obj, Team) else 'teams'
+        return (session.is_modified(obj, include_collections=False)
+                or db.inspect(obj).attrs[collection].history.has_changes())
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def bump_roster_version(session, flush_context):
+    if any(changes_roster(session, obj)
+           for obj in chain(session.new, session.dirty, session.deleted)):
+        session.connection().execute(DataVersion.bump_statement(ROSTERS))
+        session.info['data_changed'] = True
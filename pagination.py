@@ -0,0 +1,127 @@
+"""Keyset (seek) pagination for list pages.
+
+A page is fetched by filtering on the sort key of the last row seen instead
+of using OFFSET, so every page costs the same index range scan no matter how
+deep into the list it is. Cursors are opaque url-safe strings holding that
+sort key.
+"""
+
+import base64
+import binascii
+import json
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Sort key values from a cursor, or None if it is missing or malformed.
+
+    Cursors come back from the client, so anything but a list of plain
+    strings and numbers counts as malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list):
+        return None
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool)
+               for value in values):
+        return None
+    return values
+
+
+def fits(values, columns):
+    """Can cursor `values` be compared with `columns`? Same count, matching types.
+
+    A string compared with an integer column is an error on PostgreSQL.
+    """
+    if values is None or len(values) != len(columns):
+        return False
+    for value, column in zip(values, columns):
+        try:
+            expected = column.type.python_type
+        except NotImplementedError:
+            continue
+        if expected is float:
+            expected = (int, float)
+        if not isinstance(value, expected):
+            return False
+    return True
+
+
+class Page:
+    """One page of rows plus cursors for the pages either side (None at the ends)."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_page(query, columns, size, after=None, before=None, descending=False):
+    """Fetch one page of `query` ordered by `columns`, which must be unique together.
+
+    after/before: cursors from a previous Page's next_cursor/prev_cursor.
+    descending: order by every column descending instead.
+    """
+    key = tuple_(*columns)
+    after, before = decode_cursor(after), decode_cursor(before)
+    if not fits(after, columns):
+        after = None
+    if not fits(before, columns):
+        before = None
+
+    def past(cursor, backwards=False):
+        # rows beyond the cursor in page order, or before it when going backwards
+        if descending != backwards:
+            return key < tuple_(*cursor)
+        return key > tuple_(*cursor)
+
+    def order(backwards=False):
+        return [col.desc() if descending != backwards else col for col in columns]
+
+    if before is not None:
+        rows = (query.filter(past(before, backwards=True))
+                .order_by(*order(backwards=True))
+                .limit(size + 1).all())
+        has_prev, has_next = len(rows) > size, True
+        rows = rows[:size][::-1]
+    else:
+        if after is not None:
+            query = query.filter(past(after))
+        rows = query.order_by(*order()).limit(size + 1).all()
+        has_prev, has_next = after is not None, len(rows) > size
+        rows = rows[:size]
+
+    def cursor(row):
+        return encode_cursor(getattr(row, col.key) for col in columns)
+
+    return Page(rows,
+                next_cursor=cursor(rows[-1]) if rows and has_next else None,
+                prev_cursor=cursor(rows[0]) if rows and has_prev else None)
+
+
+def ranked_page(search, size, offset=0):
+    """Page through ranked results where `search(limit)` returns the best `limit` rows.
+
+    Ranked search has no stable sort key to seek on, so its cursors are offsets.
+    """
+    offset = max(0, offset)
+    rows = search(offset + size + 1)
+    items = rows[offset:offset + size]
+    return Page(items,
+                next_cursor=str(offset + size) if len(rows) > offset + size else None,
+                prev_cursor=str(max(0, offset - size)) if offset else None)
@@ -0,0 +1,96 @@
+"""A cap on how many bcrypt hashes run at once.
+
+bcrypt is slow on purpose, and each hash keeps a CPU core busy for the whole
+cost. Hashes run on a small dedicated pool, so a login burst can take at
+most `workers` cores and other requests keep being served. This is only a
+concurrency cap: the request thread still blocks until its hash is done, so
+it adds no worker capacity. Once `max_pending` hashes are queued or running,
+further calls fail fast with HasherBusy instead of piling up behind them.
+
+The cost factor (log2 rounds) is configurable. authenticate() in models.py
+rehashes a password at the configured cost whenever a stored hash was made
+with a different one.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_bcrypt import Bcrypt
+
+_bcrypt = Bcrypt()
+
+
+def _release_after(slots, fn, *args):
+    # the slot stays taken until the hash finishes, even if the caller stopped waiting
+    try:
+        return fn(*args)
+    finally:
+        slots.release()
+
+
+class HasherBusy(Exception):
+    """Too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    """bcrypt hash/check calls run on a bounded executor.
+
+    rounds: bcrypt cost factor for new hashes.
+    workers: hashes computed at the same time.
+    max_pending: hashes allowed queued or running before HasherBusy.
+    timeout: seconds to wait for a queued hash.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=32, timeout=10):
+        self.configure(rounds, workers, max_pending, timeout)
+
+    def configure(self, rounds=12, workers=2, max_pending=32, timeout=10):
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='password-hash')
+
+    def init_app(self, app):
+        """Configure from PASSWORD_HASH_* settings."""
+        self.configure(rounds=app.config['PASSWORD_HASH_ROUNDS'],
+                       workers=app.config['PASSWORD_HASH_WORKERS'],
+                       max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+                       timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+
+    def _run(self, fn, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HasherBusy('too many password hashes in progress')
+        try:
+            future = self._executor.submit(_release_after, slots, fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise HasherBusy(f'password hash still queued after {self.timeout}s') from None
+
+    def hash(self, password):
+        """bcrypt hash of `password` at the configured cost, as a str."""
+        if not password:
+            raise ValueError('Password must be non-empty.')
+        return self._run(_bcrypt.generate_password_hash, password, self.rounds).decode('utf8')
+
+    def check(self, hashed, password):
+        if not password:
+            return False
+        return self._run(_bcrypt.check_password_hash, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """Was `hashed` made with a different cost than the configured one?"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+hasher = PasswordHasher()
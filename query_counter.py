@@ -0,0 +1,62 @@
+"""Count the SQL queries each request runs and enforce per-view budgets.
+
+Views can declare how many queries they should need with @query_budget(n);
+others fall back to QUERY_BUDGET_DEFAULT. A request that goes over is
+logged, or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is set (the
+view tests turn it on, so an N+1 regression fails them). In debug mode,
+and whenever the budget is strict, the count is also sent back in an
+X-Query-Count header.
+"""
+
+import logging
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more queries than its view's budget."""
+
+
+def query_budget(limit):
+    """Declare the most queries a view should run per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_query_counter(app, engine):
+    """Start counting queries on `engine` and check budgets after each request."""
+    app.config.setdefault('QUERY_BUDGET_DEFAULT', 20)
+    app.config.setdefault('QUERY_BUDGET_STRICT', False)
+    event.listen(engine, 'before_cursor_execute', count_query)
+
+    @app.before_request
+    def reset_query_count():
+        # g can outlive a request here (connect_db pushes a long-lived app context)
+        g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        count = g.get('query_count', 0)
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', app.config['QUERY_BUDGET_DEFAULT'])
+        strict = app.config['QUERY_BUDGET_STRICT']
+
+        if app.debug or strict:
+            response.headers['X-Query-Count'] = str(count)
+
+        if budget is not None and count > budget:
+            message = f'{request.method} {request.path} ran {count} queries (budget {budget})'
+            if strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
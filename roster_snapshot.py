@@ -0,0 +1,142 @@
+"""Immutable in-memory copy of every team, player and roster.
+
+Teams and players only change when seed.py / sync runs (or someone edits
+them), and every such change bumps the 'rosters' DataVersion. Each worker
+keeps one RosterSnapshot built from a handful of queries. Pages read from
+it instead of going to the database, and a new snapshot is built and
+swapped in whole once the version moves on.
+
+Records are NamedTuples: read-only, compact, with the attribute names the
+templates already use.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import NamedTuple, Optional
+
+from grouping import group_players
+from models import db, Team, Player, TeamPlayers
+
+
+class TeamRecord(NamedTuple):
+    id: int
+    name: str
+    city: str
+    coach: str
+    owner: Optional[str]
+    stadium: str
+    established: Optional[int]
+    logo: Optional[str]
+    lookup_id: Optional[int]
+
+
+class PlayerRecord(NamedTuple):
+    id: int
+    name: str
+    age: Optional[int]
+    height: Optional[str]
+    weight: Optional[str]
+    college: Optional[str]
+    group: Optional[str]
+    position: Optional[str]
+    number: Optional[int]
+    salary: Optional[str]
+    seasons: Optional[int]
+    image_url: Optional[str]
+    lookup_id: Optional[int]
+
+
+def columns(model, record):
+    return [getattr(model, field) for field in record._fields]
+
+
+class RosterSnapshot:
+    """Teams and players indexed by id, team, group and name prefix."""
+
+    def __init__(self, version, teams, players, memberships):
+        self.version = version
+        self.teams = tuple(sorted(teams, key=lambda team: team.id))
+        self.teams_by_id = {team.id: team for team in self.teams}
+        self.players_by_id = {player.id: player for player in players}
+
+        rosters = {team.id: [] for team in self.teams}
+        for team_id, player_id in memberships:
+            # load() reads each table separately, so a sync committing in between can
+            # leave rows for teams/players not loaded here; its version bump rebuilds us
+            player = self.players_by_id.get(player_id)
+            if team_id in rosters and player is not None:
+                rosters[team_id].append(player)
+        self._rosters = {team_id: tuple(sorted(roster, key=lambda player: player.name))
+                         for team_id, roster in rosters.items()}
+        self._groups = {team_id: {group: tuple(members)
+                                  for group, members in group_players(roster).items()}
+                        for team_id, roster in self._rosters.items()}
+
+        self._names = sorted((player.name.lower(), player.id) for player in players)
+
+    @classmethod
+    def load(cls, version):
+        """Build a snapshot from the database with one query per table."""
+        teams = [TeamRecord(*row) for row in db.session.query(*columns(Team, TeamRecord))]
+        players = [PlayerRecord(*row) for row in db.session.query(*columns(Player, PlayerRecord))]
+        memberships = db.session.query(TeamPlayers.team_id, TeamPlayers.player_id).all()
+        return cls(version, teams, players, memberships)
+
+    def team(self, id):
+        return self.teams_by_id.get(id)
+
+    def player(self, id):
+        return self.players_by_id.get(id)
+
+    def roster(self, team_id, group=None):
+        """A team's players ordered by name, optionally only one group."""
+        if group is None:
+            return self._rosters.get(team_id, ())
+        return self._groups.get(team_id, {}).get(group, ())
+
+    def players_named(self, prefix, limit=10):
+        """Players whose name starts with `prefix` (case-insensitive), alphabetically."""
+        prefix = prefix.lower()
+        found = []
+        i = bisect_left(self._names, (prefix,))
+        while i < len(self._names) and len(found) < limit:
+            name, id = self._names[i]
+            if not name.startswith(prefix):
+                break
+            found.append(self.players_by_id[id])
+            i += 1
+        return found
+
+
+class RosterSnapshots:
+    """Hands out the snapshot for the current data version, rebuilding it when that changes.
+
+    versions: anything with a version() method, e.g. the FragmentCache.
+    While one thread rebuilds, others keep getting the previous snapshot.
+    """
+
+    def __init__(self, versions, load=RosterSnapshot.load):
+        self.versions = versions
+        self.load = load
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = self.versions.version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        # only one rebuild at a time; others serve the old snapshot meanwhile
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self.load(version)
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Drop the snapshot so the next get() rebuilds it."""
+        self._snapshot = None
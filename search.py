@@ -0,0 +1,164 @@
+"""Case-insensitive, typo-tolerant, ranked search for players and users.
+
+On PostgreSQL the matching and ranking run in SQL on pg_trgm (the GIN
+trigram indexes declared in models.py cover ILIKE and word similarity). Other
+databases, i.e. SQLite test runs, use TrigramIndex, a small pure-Python
+version of the same scoring built from the rows at query time.
+"""
+
+import re
+
+from sqlalchemy import case, func, literal, or_
+
+from models import db, User, Team, Player, TeamPlayers
+
+# pg_trgm's default word_similarity_threshold
+SIMILARITY_THRESHOLD = 0.6
+
+# how much a match on each player field counts towards the rank
+PLAYER_WEIGHTS = {'name': 1.0, 'team': 0.8, 'position': 0.7, 'college': 0.6}
+
+
+def escape_like(text):
+    return re.sub(r'([\\%_])', r'\\\1', text)
+
+
+def trigrams(text):
+    """pg_trgm style trigrams: lowercase words padded with two spaces in front and one behind."""
+    grams = set()
+    for word in re.findall(r'[^\W_]+', text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def word_similarity(query, text):
+    """How well `query` matches the best run of words in `text`, from 0 to 1."""
+    if not query or not text:
+        return 0.0
+    if query.lower() in text.lower():
+        return 1.0
+    words = text.split()
+    size = max(1, len(query.split()))
+    runs = [' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))]
+    return max(similarity(query, run) for run in runs)
+
+
+class TrigramIndex:
+    """In-memory search over weighted text fields of some documents.
+
+    fields: {name: weight}; documents are added as (key, {name: text}).
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.documents = {}
+        self.postings = {}
+
+    def add(self, key, values):
+        self.documents[key] = values
+        for name, text in values.items():
+            for gram in trigrams(text or ''):
+                self.postings.setdefault(gram, set()).add(key)
+
+    def candidates(self, query):
+        keys = set()
+        for gram in trigrams(query):
+            keys |= self.postings.get(gram, set())
+        return keys
+
+    def score(self, key, query):
+        """(best unweighted match of any field, weighted rank) for one document."""
+        values = self.documents[key]
+        matches = {name: word_similarity(query, values.get(name) or '') for name in self.fields}
+        return (max(matches.values()),
+                max(weight * matches[name] for name, weight in self.fields.items()))
+
+    def search(self, query, threshold=SIMILARITY_THRESHOLD):
+        """Keys of documents with a field matching `query`, best ranked first."""
+        ranked = []
+        for key in self.candidates(query):
+            match, rank = self.score(key, query)
+            if match >= threshold:
+                ranked.append((rank, key))
+        ranked.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [key for rank, key in ranked]
+
+
+def use_trigram_sql():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def player_rank(q):
+    return func.greatest(
+        func.word_similarity(q, Player.name) * PLAYER_WEIGHTS['name'],
+        func.coalesce(func.max(func.word_similarity(q, Team.name)), 0) * PLAYER_WEIGHTS['team'],
+        case((func.lower(Player.position) == q.lower(), PLAYER_WEIGHTS['position']), else_=0),
+        func.coalesce(func.word_similarity(q, Player.college), 0) * PLAYER_WEIGHTS['college'])
+
+
+def search_players(q, limit=None):
+    """Players matching `q` on name, team, position or college, best match first."""
+    q = q.strip()
+    if not q:
+        return []
+
+    if use_trigram_sql():
+        pattern = f'%{escape_like(q)}%'
+        rank = player_rank(q)
+        query = (db.session.query(Player)
+                 .outerjoin(TeamPlayers, TeamPlayers.player_id == Player.id)
+                 .outerjoin(Team, Team.id == TeamPlayers.team_id)
+                 .filter(or_(Player.name.ilike(pattern, escape='\\'),
+                             Player.name.op('%>')(q),
+                             Team.name.op('%>')(q),
+                             Player.college.op('%>')(q),
+                             func.lower(Player.position) == q.lower()))
+                 .group_by(Player.id)
+                 .order_by(rank.desc(), Player.name))
+        return query.limit(limit).all()
+
+    index = TrigramIndex(PLAYER_WEIGHTS)
+    rows = (db.session.query(Player.id, Player.name, Player.position, Player.college, Team.name)
+            .outerjoin(TeamPlayers, TeamPlayers.player_id == Player.id)
+            .outerjoin(Team, Team.id == TeamPlayers.team_id))
+    for player_id, name, position, college, team in rows:
+        index.add(player_id, {'name': name, 'position': position, 'college': college, 'team': team})
+    ids = index.search(q)[:limit]
+    return ordered_by_ids(Player, ids)
+
+
+def search_users(q, limit=None):
+    """Users whose username matches `q`, best match first."""
+    q = q.strip()
+    if not q:
+        return []
+
+    if use_trigram_sql():
+        pattern = f'%{escape_like(q)}%'
+        query = (User.query
+                 .filter(or_(User.username.ilike(pattern, escape='\\'),
+                             User.username.op('%>')(q)))
+                 .order_by(func.word_similarity(literal(q), User.username).desc(), User.username))
+        return query.limit(limit).all()
+
+    index = TrigramIndex({'username': 1.0})
+    for user_id, username in db.session.query(User.id, User.username):
+        index.add(user_id, {'username': username})
+    ids = index.search(q)[:limit]
+    return ordered_by_ids(User, ids)
+
+
+def ordered_by_ids(model, ids):
+    """Load rows for `ids` in one query, keeping the order of `ids`."""
+    if not ids:
+        return []
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+    return [rows[id] for id in ids if id in rows]
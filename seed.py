@@ -1,58 +1,23 @@
-import requests
-import time
-
-from app import db, API_BASE_URL, API_KEY
-from models import Team, Player
-
-
-
-YEAR = 2023
-
-db.drop_all()
-db.create_all()
-
-headers = {'x-apisports-key': API_KEY}
-params = {'league': 1, 'season': YEAR}
-
-res = requests.get(f'{API_BASE_URL}/teams', headers=headers, params=params)
-res = res.json()
-
-teams = res['response']
-
-for team in teams:
-
-    if team['city'] is None:
-        continue
-    t = Team(name=team['name'],
-             city=team['city'],
-             coach=team['coach'],
-             owner=team['owner'],
-             stadium=team['stadium'],
-             established=team['established'],
-             logo=team['logo'], 
-             lookup_id=team['id'])
-    db.session.add(t)
-    db.session.commit()
-    params = {'team': team['id'], 'season': YEAR}
-    res2 = requests.get(f'{API_BASE_URL}/players', headers=headers, params=params)
-    res2 = res2.json()
-    players = res2['response']
-    for player in players:
-        p = Player(name=player['name'],
-                   age=player['age'],
-                   height=player['height'],
-                   weight=player['weight'],
-                   college=player['college'],
-                   group=player['group'],
-                   position=player['position'],
-                   number=player['number'],
-                   salary=player['salary'],
-                   seasons=player['experience'],
-                   image_url=player['image'],
-                   lookup_id=player['id'])
-        
-        t.players.append(p)
-        
-        db.session.add(p)
-        db.session.commit()
-    time.sleep(8)
\ No newline at end of file
+import argparse
+
+from app import db, YEAR
+from ingest import seed, sync, DEFAULT_PER_MINUTE
+
+
+parser = argparse.ArgumentParser(description='Drop and reload all teams and players from the API.')
+parser.add_argument('--sync', action='store_true',
+                    help='update the existing database in place instead of dropping it')
+parser.add_argument('--season', type=int, default=YEAR)
+parser.add_argument('--workers', type=int, default=4,
+                    help='roster requests allowed in flight at once')
+parser.add_argument('--per-minute', type=int, default=DEFAULT_PER_MINUTE,
+                    help='starting request quota; corrected from the API response headers')
+args = parser.parse_args()
+
+if args.sync:
+    db.create_all()
+    sync(args.season, args.workers, args.per_minute)
+else:
+    db.drop_all()
+    db.create_all()
+    seed(args.season, args.workers, args.per_minute)
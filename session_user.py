@@ -0,0 +1,149 @@
+"""The logged-in user, cached in the signed session cookie.
+
+Login stores the user's id, username, image and session_version in the
+session. Later requests build g.user from that payload without querying
+the users table. The User row is loaded only when a view actually needs
+the model.
+
+The payload is reloaded from the database when:
+- this process has seen the user's session_version change (profile edit,
+  favorite change or delete);
+- the payload is older than SESSION_USER_TTL seconds, which bounds how
+  stale it can get when the change happened in another worker.
+"""
+
+import threading
+import time
+from functools import cached_property
+
+from flask import session
+
+from models import User
+
+SESSION_USER_KEY = 'curr_user_info'
+
+# user id -> latest session_version seen by this process (None once deleted)
+_versions = {}
+_versions_lock = threading.Lock()
+
+DELETED = object()
+
+
+def note_version(user_id, version):
+    with _versions_lock:
+        _versions[user_id] = version
+
+
+def note_deleted(user_id):
+    note_version(user_id, DELETED)
+
+
+def known_version(user_id):
+    with _versions_lock:
+        return _versions.get(user_id)
+
+
+class SessionUser:
+    """Lightweight stand-in for the logged-in User built from the session payload.
+
+    id, username and image_url come from the session. Favorite ids are
+    loaded by user id. Any other attribute loads the full User row on
+    first use.
+    """
+
+    def __init__(self, data, model=None):
+        self.id = data['id']
+        self.username = data['username']
+        self.image_url = data['image_url']
+        self.session_version = data['version']
+        self._favorite_ids = None
+        if model is not None:
+            self.__dict__['model'] = model
+
+    @cached_property
+    def model(self):
+        return User.query.get(self.id)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def load_favorite_ids(self):
+        self._favorite_ids = User.favorite_ids_for(self.id)
+        return self._favorite_ids
+
+    @property
+    def favorite_team_ids(self):
+        if 'model' in self.__dict__:
+            return self.model.favorite_team_ids
+        if self._favorite_ids is None:
+            self.load_favorite_ids()
+        return self._favorite_ids[0]
+
+    @property
+    def favorite_player_ids(self):
+        if 'model' in self.__dict__:
+            return self.model.favorite_player_ids
+        if self._favorite_ids is None:
+            self.load_favorite_ids()
+        return self._favorite_ids[1]
+
+    def is_favorite_team(self, other_team):
+        return other_team.id in self.favorite_team_ids
+
+    def is_favorite_player(self, other_player):
+        return other_player.id in self.favorite_player_ids
+
+    def __repr__(self):
+        return f"<SessionUser #{self.id}: {self.username}>"
+
+
+def remember_user(user):
+    """Store `user`'s identity in the session and note its version."""
+    data = {'id': user.id,
+            'username': user.username,
+            'image_url': user.image_url,
+            'version': user.session_version,
+            'checked_at': time.time()}
+    session[SESSION_USER_KEY] = data
+    note_version(user.id, user.session_version)
+    return data
+
+
+def bump_version(user_id):
+    """Bump a user's session_version (commit pending) and keep this session's payload in step."""
+    version = User.bump_session_version(user_id)
+    note_version(user_id, version)
+    data = session.get(SESSION_USER_KEY)
+    if isinstance(data, dict) and data.get('id') == user_id:
+        session[SESSION_USER_KEY] = dict(data, version=version)
+    return version
+
+
+def forget_user():
+    session.pop(SESSION_USER_KEY, None)
+
+
+def is_current(data, user_id, ttl):
+    """Can this session payload be trusted without going to the database?"""
+    if not isinstance(data, dict) or data.get('id') != user_id:
+        return False
+    if time.time() - data.get('checked_at', 0) > ttl:
+        return False
+    known = known_version(user_id)
+    return known is None or known == data.get('version')
+
+
+def load_session_user(user_id, ttl):
+    """SessionUser for `user_id`, from the session payload when it is current.
+
+    Returns None if the user no longer exists.
+    """
+    data = session.get(SESSION_USER_KEY)
+    if is_current(data, user_id, ttl):
+        return SessionUser(data)
+
+    user = User.query.get(user_id)
+    if user is None:
+        forget_user()
+        return None
+    return SessionUser(remember_user(user), model=user)
@@ -1,31 +1,78 @@
-$('.team-fav').on('submit', async function(evt) {
-    evt.preventDefault()
-    let e = evt.target
-    let res = await axios.post(`/users/toggle-favorite-team/${e.id}`)
-    let button = $(`#team-btn${e.id}`)
-    if (res.data !== 'Unauthorized') {
-        if (button.hasClass('btn-danger')) {
-            button.removeClass('btn-danger')
-            button.addClass('btn-secondary')
-        } else {
-            button.removeClass('btn-secondary')
-            button.addClass('btn-danger')
+// Favorite clicks flip the button straight away and are sent together:
+// changes made within FAVORITE_DELAY ms of each other go out as one POST.
+const FAVORITE_DELAY = 400
+let pendingFavorites = new Map()
+let favoriteTimer = null
+
+// the same team or player can be on a page more than once (e.g. under
+// "Your Favorites" and in the depth chart), so every copy is looked up
+function favoriteButtons(kind, id) {
+    return $(`.${kind}-fav[data-id="${id}"] button`)
+}
+
+function showFavorite(kind, id, favorite) {
+    let button = favoriteButtons(kind, id)
+    button.toggleClass('btn-danger', favorite)
+    button.toggleClass('btn-secondary', !favorite)
+}
+
+function queueFavorite(kind, id) {
+    let favorite = !favoriteButtons(kind, id).hasClass('btn-danger')
+    showFavorite(kind, id, favorite)
+    pendingFavorites.set(`${kind}:${id}`, {kind, id: Number(id), favorite})
+    clearTimeout(favoriteTimer)
+    favoriteTimer = setTimeout(flushFavorites, FAVORITE_DELAY)
+}
+
+async function flushFavorites() {
+    let ops = [...pendingFavorites.values()]
+    pendingFavorites.clear()
+    if (!ops.length) return
+    try {
+        let res = await axios.post('/api/favorites', {ops})
+        let saved = {team: new Set(res.data.team_ids), player: new Set(res.data.player_ids)}
+        for (let op of ops) {
+            if (!pendingFavorites.has(`${op.kind}:${op.id}`)) {
+                showFavorite(op.kind, op.id, saved[op.kind].has(op.id))
+            }
+        }
+    } catch (err) {
+        for (let op of ops) {
+            if (!pendingFavorites.has(`${op.kind}:${op.id}`)) {
+                showFavorite(op.kind, op.id, !op.favorite)
+            }
         }
     }
+}
+
+$(document).on('submit', '.team-fav', function(evt) {
+    evt.preventDefault()
+    queueFavorite('team', this.dataset.id)
 })
 
-$('.player-fav').on('submit', async function(evt) {
+$(document).on('submit', '.player-fav', function(evt) {
     evt.preventDefault()
-    let e = evt.target
-    let res = await axios.post(`/users/toggle-favorite-player/${e.id}`)
-    let button = $(`#btn${e.id}`)
-    if (res.data !== 'Unauthorized') {
-        if (button.hasClass('btn-danger')) {
-            button.removeClass('btn-danger')
-            button.addClass('btn-secondary')
-        } else {
-            button.removeClass('btn-secondary')
-            button.addClass('btn-danger')
+    queueFavorite('player', this.dataset.id)
+})
+
+// don't lose queued changes when leaving the page
+window.addEventListener('pagehide', function() {
+    let ops = [...pendingFavorites.values()]
+    if (ops.length) {
+        pendingFavorites.clear()
+        navigator.sendBeacon('/api/favorites',
+                             new Blob([JSON.stringify({ops})], {type: 'application/json'}))
+    }
+})
+
+$(async function() {
+    let stats = $('#player-stats')
+    if (stats.length) {
+        try {
+            let res = await axios.get(stats.data('url'))
+            stats.html(res.data)
+        } catch (err) {
+            stats.html('<h2>No stats found</h2>')
         }
     }
-})
\ No newline at end of file
+})
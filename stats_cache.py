@@ -0,0 +1,224 @@
+"""Read-through cache for player statistics pulled from api-sports.io.
+
+Stats are keyed on (lookup_id, season). Fresh entries are served straight
+from the cache, stale entries are served while a background thread refreshes
+them, and anything older than that is fetched again before returning.
+Concurrent misses for the same key share a single upstream request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from models import db, CachedPlayerStats
+
+
+class MemoryBackend:
+    """In-process LRU store of (value, fetched_at) pairs."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, fetched_at):
+        with self._lock:
+            self._entries[key] = (value, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DatabaseBackend:
+    """Shared store backed by the player_stats_cache table.
+
+    Every worker sees the same entries, so a refresh done by one worker
+    saves the API call for all of them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, key):
+        with self.app.app_context():
+            row = db.session.get(CachedPlayerStats, key)
+            if row is None:
+                return None
+            return (row.payload, row.fetched_at)
+
+    def set(self, key, value, fetched_at):
+        lookup_id, season = key
+        with self.app.app_context():
+            db.session.merge(CachedPlayerStats(lookup_id=lookup_id,
+                                               season=season,
+                                               payload=value,
+                                               fetched_at=fetched_at))
+            db.session.commit()
+
+    def delete(self, key):
+        with self.app.app_context():
+            CachedPlayerStats.query.filter_by(lookup_id=key[0], season=key[1]).delete()
+            db.session.commit()
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one call.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running wait for it and get the same result (or exception).
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.value = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (value, shared), where shared is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self.Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+
+class StatsCache:
+    """Read-through cache in front of a `fetch(lookup_id, season)` callable.
+
+    ttl: seconds an entry is served without refreshing.
+    stale_ttl: extra seconds a stale entry is served while it refreshes.
+    backend: optional shared store consulted when the LRU misses.
+    """
+
+    def __init__(self, fetch, ttl=6 * 60 * 60, stale_ttl=24 * 60 * 60,
+                 max_entries=2048, backend=None, clock=time.time):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.memory = MemoryBackend(max_entries)
+        self.backend = backend
+        self.clock = clock
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+                         'refreshes': 0, 'refresh_errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self.memory.set(key, *entry)
+        return entry
+
+    def _store(self, key, value):
+        fetched_at = self.clock()
+        self.memory.set(key, value, fetched_at)
+        if self.backend is not None:
+            self.backend.set(key, value, fetched_at)
+
+    def get(self, lookup_id, season):
+        """Return stats for a player/season, fetching them only when needed."""
+        key = (lookup_id, season)
+        entry = self._lookup(key)
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = self.clock() - fetched_at
+            if age < self.ttl:
+                self._count('hits')
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self.refresh_in_background(key)
+                return value
+
+        value, shared = self._flight.do(key, lambda: self._fetch_and_store(key))
+        self._count('coalesced' if shared else 'misses')
+        return value
+
+    def _fetch_and_store(self, key):
+        value = self.fetch(*key)
+        self._store(key, value)
+        return value
+
+    def refresh_in_background(self, key):
+        """Start a refresh thread for `key` unless one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+        thread = threading.Thread(target=self._refresh, args=(key,), daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh(self, key):
+        try:
+            self._flight.do(key, lambda: self._fetch_and_store(key))
+            self._count('refreshes')
+        except Exception:
+            # keep serving the stale copy; the next request will try again
+            self._count('refresh_errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, lookup_id, season):
+        key = (lookup_id, season)
+        self.memory.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def stats(self):
+        """Counters plus the number of entries held in memory."""
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['coalesced'] + stats['misses']
+        stats['entries'] = len(self.memory)
+        stats['hit_rate'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,153 @@
+"""API client tests against a local stub server."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from api_client import ApiClient, ApiError, CircuitBreaker, CircuitOpen
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Replies with the next (status, body, delay[, headers]) queued on the server."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        status, body, delay, *headers = (self.server.replies.pop(0) if self.server.replies
+                                         else (200, {'response': []}, 0))
+        time.sleep(delay)
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            for name, value in (headers[0] if headers else {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except BrokenPipeError:
+            # the client already gave up waiting
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiClientTestCase(TestCase):
+    """Test timeouts, retries and the circuit breaker."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.replies = []
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.sleeps = []
+        self.client = ApiClient(f'http://127.0.0.1:{self.server.server_port}', 'test-key',
+                                timeout=(1, 0.2), retries=2, backoff=0.01, max_delay=5,
+                                breaker=CircuitBreaker(threshold=3, reset_timeout=60),
+                                sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_success(self):
+        """Does a normal call return the response list?"""
+        self.server.replies = [(200, {'response': [{'id': 1}]}, 0)]
+        self.assertEqual(self.client.response('players', {'id': 1}), [{'id': 1}])
+        self.assertEqual(self.server.requests, ['/players?id=1'])
+
+    def test_errors_body(self):
+        """Does a 200 carrying API errors raise instead of returning an empty list?"""
+        self.server.replies = [(200, {'errors': {'rateLimit': 'Too many requests'}, 'response': []}, 0)]
+        with self.assertRaises(ApiError):
+            self.client.response('players/statistics', {'id': 1})
+
+    def test_retry_on_server_error(self):
+        """Are 5xx and 429 responses retried with a backoff?"""
+        self.server.replies = [(503, {}, 0), (429, {}, 0), (200, {'response': ['ok']}, 0)]
+        self.assertEqual(self.client.response('teams'), ['ok'])
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_retry_after(self):
+        """Is a short Retry-After waited out and a long one not retried at all?"""
+        self.server.replies = [(429, {}, 0, {'Retry-After': '3'}), (200, {'response': ['ok']}, 0)]
+        self.assertEqual(self.client.response('teams'), ['ok'])
+        self.assertEqual(self.sleeps, [3])
+
+        self.server.replies = [(429, {}, 0, {'Retry-After': '60'}), (200, {'response': ['ok']}, 0)]
+        with self.assertRaises(ApiError):
+            self.client.get('teams')
+        self.assertEqual(self.sleeps, [3])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_read_timeout(self):
+        """Does a hung upstream raise ApiError instead of blocking forever?"""
+        self.server.replies = [(200, {}, 1)] * 3
+        with self.assertRaises(ApiError):
+            self.client.get('teams')
+
+    def test_client_error_not_retried(self):
+        """Are 4xx errors other than 429 raised straight away?"""
+        self.server.replies = [(404, {}, 0)]
+        with self.assertRaises(ApiError):
+            self.client.get('nope')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_circuit_opens(self):
+        """Does the client stop calling once the breaker opens?"""
+        self.server.replies = [(500, {}, 0)] * 3
+        with self.assertRaises(ApiError):
+            self.client.get('teams')
+        self.assertEqual(self.client.breaker.state, 'open')
+
+        with self.assertRaises(CircuitOpen):
+            self.client.get('teams')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_other_request_errors_count_as_failures(self):
+        """Does a transport error other than connect/timeout still end a half-open trial?"""
+        now = [0]
+        self.client.breaker = CircuitBreaker(threshold=1, reset_timeout=10, clock=lambda: now[0])
+        self.client.retries = 0
+        self.client.breaker.record_failure()
+        now[0] = 10
+
+        with patch.object(self.client.session, 'get', side_effect=requests.exceptions.ChunkedEncodingError):
+            with self.assertRaises(ApiError):
+                self.client.get('teams')
+        self.assertFalse(self.client.breaker.trial_running)
+        self.assertEqual(self.client.breaker.state, 'open')
+
+        now[0] = 20
+        self.server.replies = [(200, {'response': ['ok']}, 0)]
+        self.assertEqual(self.client.response('teams'), ['ok'])
+        self.assertEqual(self.client.breaker.state, 'closed')
+
+
+class CircuitBreakerTestCase(TestCase):
+    """Test breaker state changes."""
+
+    def test_half_open_trial(self):
+        """After the reset timeout, does one trial call decide whether the circuit closes?"""
+        now = [0]
+        breaker = CircuitBreaker(threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        now[0] = 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+        now[0] = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
@@ -0,0 +1,115 @@
+import os
+from unittest import TestCase
+
+from models import db, User, Player, Team
+from pagination import encode_cursor
+
+os.environ['DATABASE_URL'] = "postgresql:///sportstest"
+
+from app import app
+
+db.create_all()
+
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['QUERY_BUDGET_STRICT'] = True
+
+
+class ApiViewTestCase(TestCase):
+    """Test the read-only JSON API."""
+
+    def setUp(self):
+        """Create test client, add sample data."""
+        Team.query.delete()
+        Player.query.delete()
+        User.query.delete()
+
+        self.client = app.test_client()
+
+        self.team = Team(name="Test Team",
+                         city="Kansas City",
+                         coach="Coach Test",
+                         stadium="Test Stadium")
+        self.team.id = 4321
+        for n, (name, group) in enumerate([('Player One', 'Offense'),
+                                           ('Player Two', 'Defense'),
+                                           ('Player Three', 'Offense')]):
+            p = Player(name=name, group=group, position="QB", lookup_id=5555 + n)
+            p.id = 1000 + n
+            self.team.players.append(p)
+        db.session.add(self.team)
+
+        user = User.register(username="testuser",
+                             email="test@test.com",
+                             pwd="testuser",
+                             image_url=None)
+        user.id = 1234
+        db.session.commit()
+
+    def test_list_players_with_fields(self):
+        """Are only the requested fields sent, in order, for every player?"""
+        resp = self.client.get('/api/players?fields=name,position')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json['data'][0], {'name': 'Player One', 'position': 'QB'})
+        self.assertEqual(len(resp.json['data']), 3)
+        self.assertIsNone(resp.json['next'])
+
+    def test_rows_format(self):
+        resp = self.client.get('/api/players?fields=id,name&format=rows')
+        self.assertEqual(resp.json['data'], {'fields': ['id', 'name'],
+                                             'rows': [[1000, 'Player One'],
+                                                      [1001, 'Player Two'],
+                                                      [1002, 'Player Three']]})
+
+    def test_pagination(self):
+        """Do next/prev links walk the list and keep ?fields=?"""
+        resp = self.client.get('/api/players?fields=name&limit=2')
+        self.assertEqual([p['name'] for p in resp.json['data']], ['Player One', 'Player Two'])
+        self.assertIn('fields=name', resp.json['next'])
+
+        resp = self.client.get(resp.json['next'])
+        self.assertEqual([p['name'] for p in resp.json['data']], ['Player Three'])
+        self.assertIsNone(resp.json['next'])
+
+        resp = self.client.get(resp.json['prev'])
+        self.assertEqual([p['name'] for p in resp.json['data']], ['Player One', 'Player Two'])
+
+    def test_tampered_cursor(self):
+        """Is a cursor with the wrong shape or types treated as no cursor instead of a 500?"""
+        for values in ([[1]], [{'id': 1}], ['1'], [True]):
+            resp = self.client.get(f'/api/players?fields=name&after={encode_cursor(values)}')
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json['data'][0]['name'], 'Player One')
+
+    def test_team_roster(self):
+        resp = self.client.get('/api/teams/4321/players?group=Offense&fields=name')
+        self.assertEqual(resp.json['data'], [{'name': 'Player One'}, {'name': 'Player Three'}])
+
+        resp = self.client.get('/api/teams/9999/players')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_single_items(self):
+        resp = self.client.get('/api/teams/4321?fields=name,city')
+        self.assertEqual(resp.json['data'], [{'name': 'Test Team', 'city': 'Kansas City'}])
+
+        resp = self.client.get('/api/players/9999')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_users_never_expose_private_fields(self):
+        resp = self.client.get('/api/users/1234')
+        self.assertEqual(set(resp.json['data'][0]), {'id', 'username', 'image_url'})
+
+        resp = self.client.get('/api/users?fields=username,password')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('password', resp.json['error'])
+
+    def test_bad_format(self):
+        resp = self.client.get('/api/teams?format=xml')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_player_names_by_prefix(self):
+        resp = self.client.get('/api/players/names?prefix=player t')
+        self.assertEqual(resp.json['data'], [{'id': 1002, 'name': 'Player Three'},
+                                             {'id': 1001, 'name': 'Player Two'}])
+
+        resp = self.client.get('/api/players/names?prefix=PLAYER&limit=1&fields=name')
+        self.assertEqual(resp.json['data'], [{'name': 'Player One'}])
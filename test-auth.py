@@ -0,0 +1,71 @@
+"""Login protection tests."""
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import auth
+from auth import SlidingWindowLimiter, RateLimited, verify_password
+from passwords import PasswordHasher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlidingWindowLimiterTestCase(TestCase):
+    """Test the per-key sliding window."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = SlidingWindowLimiter(limit=3, window=60, clock=self.clock)
+
+    def test_allows_up_to_limit(self):
+        for _ in range(3):
+            self.assertEqual(self.limiter.hit('1.2.3.4'), 0)
+        self.assertEqual(self.limiter.hit('1.2.3.4'), 60)
+        self.assertEqual(self.limiter.hit('5.6.7.8'), 0)
+
+    def test_window_slides(self):
+        """Does each attempt free up exactly when it leaves the window?"""
+        self.limiter.hit('key')
+        self.clock.now += 30
+        self.limiter.hit('key')
+        self.limiter.hit('key')
+        self.assertEqual(self.limiter.hit('key'), 30)
+
+        self.clock.now += 30
+        self.assertEqual(self.limiter.hit('key'), 0)
+        self.assertGreater(self.limiter.hit('key'), 0)
+
+    def test_check_raises(self):
+        for _ in range(3):
+            self.limiter.check('key')
+        with self.assertRaises(RateLimited) as context:
+            self.limiter.check('key')
+        self.assertEqual(context.exception.retry_after, 60)
+
+    def test_reset_and_prune(self):
+        for _ in range(3):
+            self.limiter.hit('key')
+        self.limiter.reset('key')
+        self.assertEqual(self.limiter.hit('key'), 0)
+
+        self.clock.now += 61
+        self.limiter._prune(self.clock())
+        self.assertEqual(len(self.limiter), 0)
+
+
+class VerifyPasswordTestCase(TestCase):
+    """Test that missing users cost the same bcrypt work as wrong passwords."""
+
+    def test_missing_user_checks_dummy_hash(self):
+        hasher = PasswordHasher(rounds=4)
+        with patch.object(auth, 'hasher', hasher), patch.object(auth, '_dummy_hashes', {}):
+            with patch.object(hasher, 'check', wraps=hasher.check) as check:
+                self.assertFalse(verify_password(None, 'password'))
+                self.assertEqual(check.call_count, 1)
+                self.assertTrue(check.call_args.args[0].startswith('$2b$04$'))
@@ -0,0 +1,43 @@
+"""Roster grouping tests."""
+
+from types import SimpleNamespace
+from unittest import TestCase
+
+from grouping import GROUPS, OTHER, group_by, group_players, depth_chart
+
+
+def player(name, group, position='QB'):
+    return SimpleNamespace(name=name, group=group, position=position)
+
+
+class GroupingTestCase(TestCase):
+    """Test splitting rosters into groups."""
+
+    def test_group_players_keeps_order(self):
+        players = [player('A', 'Defense'), player('B', 'Offense'), player('C', 'Defense')]
+        groups = group_players(players)
+
+        self.assertEqual(list(groups), list(GROUPS))
+        self.assertEqual([p.name for p in groups['Defense']], ['A', 'C'])
+        self.assertEqual([p.name for p in groups['Offense']], ['B'])
+        self.assertEqual(groups['Special Teams'], [])
+
+    def test_unknown_groups_are_kept(self):
+        players = [player('A', 'Practice Squad'), player('B', None), player('C', 'Offense')]
+        groups = group_players(players)
+
+        self.assertEqual(list(groups), list(GROUPS) + ['Practice Squad', OTHER])
+        self.assertEqual([p.name for p in groups['Practice Squad']], ['A'])
+        self.assertEqual([p.name for p in groups[OTHER]], ['B'])
+
+    def test_group_by_without_keys(self):
+        self.assertEqual(group_by([1, 2, 3, 4], lambda n: n % 2), {1: [1, 3], 0: [2, 4]})
+
+    def test_depth_chart(self):
+        players = [player('A', 'Offense', 'QB'), player('B', 'Offense', 'WR'),
+                   player('C', 'Offense', 'QB')]
+        chart = depth_chart(players)
+
+        self.assertEqual([p.name for p in chart['Offense']['QB']], ['A', 'C'])
+        self.assertEqual([p.name for p in chart['Offense']['WR']], ['B'])
+        self.assertEqual(chart['Defense'], {})
@@ -0,0 +1,60 @@
+"""Query plan tests for the indexes declared in models.py."""
+
+import os
+from unittest import TestCase
+
+from models import db
+
+os.environ['DATABASE_URL'] = "postgresql:///sportstest"
+
+from app import app
+
+db.create_all()
+
+
+def query_plan(sql):
+    """The planner's output for `sql` as one string."""
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            # the test tables are tiny, so make the planner show whether an index can be used
+            conn.exec_driver_sql('SET enable_seqscan = off')
+            rows = conn.exec_driver_sql(f'EXPLAIN {sql}')
+        else:
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+
+class IndexPlanTestCase(TestCase):
+    """Do the hot queries use an index instead of scanning the table?"""
+
+    def assertUsesIndex(self, sql, index):
+        plan = query_plan(sql)
+        self.assertIn(index, plan, plan)
+
+    def test_roster_by_group(self):
+        """Do roster pages use the (group, name) index?"""
+        self.assertUsesIndex("""SELECT * FROM players WHERE "group" = 'Offense' ORDER BY name""",
+                             'ix_players_group_name')
+
+    def test_players_by_name(self):
+        """Does sorting players by name use the name index?"""
+        self.assertUsesIndex('SELECT * FROM players ORDER BY name LIMIT 24', 'ix_players_name')
+
+    def test_teams_for_player(self):
+        """Does finding a player's teams use the reverse team_players index?"""
+        self.assertUsesIndex('SELECT team_id FROM team_players WHERE player_id = 1',
+                             'ix_team_players_player_id')
+
+    def test_fans_of_player(self):
+        """Does finding who favorited a player use the favorite_players index?"""
+        self.assertUsesIndex('SELECT user_id FROM favorite_players WHERE player_id = 1',
+                             'ix_favorite_players_player_id')
+
+    def test_fans_of_team(self):
+        """Does finding who favorited a team use the favorite_teams index?"""
+        self.assertUsesIndex('SELECT user_id FROM favorite_teams WHERE team_id = 1',
+                             'ix_favorite_teams_team_id')
+
+    def test_player_by_lookup_id(self):
+        """Do seed upserts find players by lookup_id through an index?"""
+        self.assertUsesIndex('SELECT id FROM players WHERE lookup_id = 1', 'ix_players_lookup_id')
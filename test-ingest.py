@@ -0,0 +1,222 @@
+"""Seed ingestion tests."""
+
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from models import db, Team, Player, User, PlayerStatistic
+
+os.environ['DATABASE_URL'] = "postgresql:///sportstest"
+
+from api_client import ApiError
+from ingest import TokenBucket, QuotaExhausted, api_get, fetch_rosters, sync_team
+from ingest_stats import ingest_stats
+from bulk_load import load_rosters
+
+db.create_all()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTestCase(TestCase):
+    """Test the request rate limiter."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(rate=1, capacity=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_wait(self):
+        """Does the bucket allow a burst up to capacity and then pace requests?"""
+        self.bucket.acquire()
+        self.bucket.acquire()
+        self.assertEqual(self.clock.now, 0)
+
+        self.bucket.acquire()
+        self.assertAlmostEqual(self.clock.now, 1)
+
+    def test_update_from_headers(self):
+        """Does the bucket follow the quota reported by the API?"""
+        self.bucket.update_from_headers({'X-RateLimit-Limit': '300', 'X-RateLimit-Remaining': '0'})
+        self.assertEqual(self.bucket.rate, 5)
+        self.assertEqual(self.bucket.capacity, 300)
+
+        self.bucket.acquire()
+        self.assertAlmostEqual(self.clock.now, 0.2)
+
+
+class FetchRostersTestCase(TestCase):
+    """Test the concurrent roster fetcher."""
+
+    def test_quota_exhausted_cancels_queued_teams(self):
+        """Are teams still queued dropped once one request runs out of quota?"""
+        calls = []
+
+        def api_get(path, params, bucket):
+            calls.append(params['team'])
+            raise QuotaExhausted('no requests left')
+
+        teams = [{'id': n} for n in range(20)]
+        with patch('ingest.api_get', api_get):
+            with self.assertRaises(QuotaExhausted):
+                list(fetch_rosters(teams, bucket=None, workers=1))
+
+        self.assertLess(len(calls), 5)
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+        self.headers = {}
+
+    def json(self):
+        return self.body
+
+
+class ApiGetTestCase(TestCase):
+    """Test reading API replies."""
+
+    def setUp(self):
+        self.bucket = TokenBucket(rate=1, capacity=10)
+
+    def test_response(self):
+        """Is the 'response' list returned when there are no errors?"""
+        with patch('ingest.api.get', return_value=FakeResponse({'errors': [], 'response': [1, 2]})):
+            self.assertEqual(api_get('players', {}, self.bucket), [1, 2])
+
+    def test_errors(self):
+        """Does an error body sent with a 200 raise instead of looking empty?"""
+        body = {'errors': {'rateLimit': 'Too many requests'}, 'response': []}
+        with patch('ingest.api.get', return_value=FakeResponse(body)):
+            with self.assertRaises(ApiError):
+                api_get('players', {}, self.bucket)
+
+
+def api_team(**kwargs):
+    team = {'id': 17, 'name': 'Test Team', 'city': 'Kansas City', 'coach': 'Coach Test',
+            'owner': None, 'stadium': 'Test Stadium', 'established': 1960, 'logo': None}
+    team.update(kwargs)
+    return team
+
+
+def api_player(n, **kwargs):
+    player = {'id': n, 'name': f'Player {n}', 'age': 26, 'height': "6'", 'weight': '200 lbs',
+              'college': 'LSU', 'group': 'Offense', 'position': 'QB', 'number': n,
+              'salary': '$1,000,000', 'experience': 5, 'image': None}
+    player.update(kwargs)
+    return player
+
+
+class SaveTeamTestCase(TestCase):
+    """Test saving and syncing a team and roster from API data."""
+
+    def setUp(self):
+        Team.query.delete()
+        Player.query.delete()
+        User.query.delete()
+        db.session.commit()
+
+    def test_load_rosters(self):
+        """Is a team saved with all of its players?"""
+        load_rosters([(api_team(), [api_player(n) for n in range(3)])])
+
+        self.assertEqual(Team.query.count(), 1)
+        self.assertEqual(len(Team.query.one().players), 3)
+        self.assertEqual(Player.query.filter_by(lookup_id=2).one().teams[0].lookup_id, 17)
+        self.assertEqual(Player.query.filter_by(lookup_id=2).one().image_url, '/static/default-pic.png')
+
+    def test_load_rosters_twice(self):
+        """Does loading the same rosters again update rows instead of duplicating them?"""
+        load_rosters([(api_team(), [api_player(n) for n in range(3)])], batch_size=2)
+        load_rosters([(api_team(), [api_player(n, number=n + 10) for n in range(3)])], batch_size=2)
+        db.session.expire_all()
+
+        self.assertEqual(Player.query.count(), 3)
+        self.assertEqual(Player.query.filter_by(lookup_id=2).one().number, 12)
+        self.assertEqual(len(Team.query.one().players), 3)
+
+    def test_sync_team(self):
+        """Does a sync update rows in place, reconcile the roster and keep favorites?"""
+        load_rosters([(api_team(), [api_player(n) for n in range(3)])])
+        t = Team.query.one()
+        user = User.register("testuser", "test@test.com", "testuser", None)
+        user.favorite_teams.append(t)
+        user.favorite_players.append(Player.query.filter_by(lookup_id=0).one())
+        db.session.commit()
+        team_id = t.id
+        player_ids = {p.lookup_id: p.id for p in Player.query}
+
+        counts = dict.fromkeys(['teams_added', 'teams_updated', 'players_added', 'players_updated',
+                                'roster_added', 'roster_removed'], 0)
+        sync_team(api_team(coach='New Coach'),
+                  [api_player(0), api_player(1, number=99), api_player(3)],
+                  counts)
+        db.session.expire_all()
+
+        self.assertEqual(counts, {'teams_added': 0, 'teams_updated': 1, 'players_added': 1,
+                                  'players_updated': 1, 'roster_added': 1, 'roster_removed': 1})
+        team = Team.query.get(team_id)
+        self.assertEqual(team.coach, 'New Coach')
+        self.assertEqual(sorted(p.lookup_id for p in team.players), [0, 1, 3])
+        self.assertEqual(Player.query.filter_by(lookup_id=1).one().id, player_ids[1])
+        self.assertEqual(Player.query.filter_by(lookup_id=2).one().teams, [])
+        self.assertEqual(len(User.query.one().favorite_teams), 1)
+        self.assertEqual(len(User.query.one().favorite_players), 1)
+
+    def test_sync_team_empty_roster(self):
+        """Is a team left alone when the API returns no players for it?"""
+        load_rosters([(api_team(), [api_player(n) for n in range(2)])])
+        counts = dict.fromkeys(['teams_added', 'teams_updated', 'players_added', 'players_updated',
+                                'roster_added', 'roster_removed'], 0)
+
+        self.assertIsNone(sync_team(api_team(coach='New Coach'), [], counts))
+        db.session.expire_all()
+
+        self.assertEqual(counts['roster_removed'], 0)
+        self.assertEqual(len(Team.query.one().players), 2)
+        self.assertEqual(Team.query.one().coach, 'Coach Test')
+
+
+class IngestStatsTestCase(TestCase):
+    """Test the batch stats ingest."""
+
+    def setUp(self):
+        PlayerStatistic.query.delete()
+        Team.query.delete()
+        Player.query.delete()
+        db.session.commit()
+        load_rosters([(api_team(), [api_player(n) for n in range(3)])])
+
+    def test_failed_players_skipped(self):
+        """Are players whose request fails skipped and reported while the rest are stored?"""
+        groups = [{'name': 'Passing', 'statistics': [{'name': 'yards', 'value': 300}]}]
+
+        def api_get(path, params, bucket):
+            if params['id'] == 1:
+                raise ApiError('GET players/statistics returned 500')
+            return [{'teams': [{'groups': groups}]}]
+
+        with patch('ingest_stats.api_get', api_get):
+            stored, failed = ingest_stats(2023)
+
+        self.assertEqual((stored, failed), (2, [1]))
+        self.assertEqual(PlayerStatistic.query.count(), 2)
+
+    def test_quota_exhausted_stops(self):
+        """Does running out of daily quota stop the run and report everyone left?"""
+        def api_get(path, params, bucket):
+            raise QuotaExhausted('no requests left')
+
+        with patch('ingest_stats.api_get', api_get):
+            stored, failed = ingest_stats(2023)
+
+        self.assertEqual(stored, 0)
+        self.assertEqual(sorted(failed), [0, 1, 2])
@@ -0,0 +1,53 @@
+"""Password hasher tests."""
+
+import threading
+from unittest import TestCase
+
+from passwords import PasswordHasher, HasherBusy
+
+
+class PasswordHasherTestCase(TestCase):
+    """Test bcrypt hashing on the bounded executor."""
+
+    def setUp(self):
+        self.hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, timeout=5)
+
+    def test_hash_and_check(self):
+        hashed = self.hasher.hash('password')
+        self.assertTrue(hashed.startswith('$2b$04$'))
+        self.assertTrue(self.hasher.check(hashed, 'password'))
+        self.assertFalse(self.hasher.check(hashed, 'wrong'))
+        self.assertFalse(self.hasher.check(hashed, ''))
+
+    def test_empty_password(self):
+        with self.assertRaises(ValueError):
+            self.hasher.hash('')
+
+    def test_needs_rehash(self):
+        hashed = self.hasher.hash('password')
+        self.assertFalse(self.hasher.needs_rehash(hashed))
+        self.hasher.rounds = 5
+        self.assertTrue(self.hasher.needs_rehash(hashed))
+        self.assertTrue(self.hasher.needs_rehash('not a hash'))
+
+    def test_busy_when_queue_is_full(self):
+        """Does a hash beyond max_pending fail fast instead of queueing?"""
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.hasher._run(slow)))
+        thread.start()
+        started.wait(5)
+
+        with self.assertRaises(HasherBusy):
+            self.hasher.hash('password')
+
+        release.set()
+        thread.join()
+        self.assertEqual(results, ['done'])
+        self.assertTrue(self.hasher.check(self.hasher.hash('password'), 'password'))
@@ -1,15 +1,24 @@
 import os
+import re
+from html import unescape
 from unittest import TestCase
 
-from models import db, connect_db, User, Player, Team
+from models import db, connect_db, User, Player, Team, PlayerStatistic
 
 os.environ['DATABASE_URL'] = "postgresql:///sportstest"
 
-from app import app, CURR_USER_KEY
+from app import app, CURR_USER_KEY, YEAR
+from pagination import encode_cursor
 
 db.create_all()
 
 app.config['WTF_CSRF_ENABLED'] = False
+app.config['QUERY_BUDGET_STRICT'] = True
+
+
+def page_link(html, link_id):
+    """href of the pagination link with id `link_id`."""
+    return unescape(re.search(f'href="([^"]*)"[^>]*id="{link_id}"', html).group(1))
 
 
 class PlayerViewTestCase(TestCase):
@@ -71,6 +80,37 @@ class PlayerViewTestCase(TestCase):
             self.assertIn('<i class="fa fa-heart"></i>', str(resp.data))
 
 
+    def test_player_stats_deferred(self):
+        """Without stored stats, is the page sent with a placeholder for app.js to fill in?"""
+        with self.client as c:
+
+            resp = c.get("/players/1234")
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('<div id="player-stats" data-url="/players/1234/stats">', str(resp.data))
+
+
+    def test_show_stored_stats(self):
+        """Are ingested stats shown on the player page?"""
+        PlayerStatistic.upsert_groups(self.testplayer_id, YEAR, [
+            {'name': 'Passing', 'statistics': [{'name': 'yards', 'value': 4183},
+                                               {'name': 'touchdowns', 'value': 27}]}])
+        db.session.commit()
+
+        with self.client as c:
+
+            resp = c.get("/players/1234")
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('<h2>Passing</h2>', str(resp.data))
+            self.assertIn('<p>Yards: 4183</p>', str(resp.data))
+
+            resp = c.get("/players/1234/stats")
+            self.assertIn('<p>Yards: 4183</p>', str(resp.data))
+
+            resp = c.get("/api/players/1234/stats")
+            self.assertEqual(resp.json['stat_groups'][0]['name'], 'Passing')
+            self.assertEqual(resp.json['stat_groups'][0]['statistics'][0], {'name': 'yards', 'value': '4183'})
+
+
     def test_list_players(self):
         """Does the /players route show all players if no query given?"""
         p = Player(name='Player Two',
@@ -118,4 +158,133 @@ class PlayerViewTestCase(TestCase):
 
             resp=c.get('/players?q=Two')
             self.assertNotIn("<p>Player One</p>", str(resp.data))
-            self.assertIn("<p>Player Two</p>", str(resp.data))       
\ No newline at end of file
+            self.assertIn("<p>Player Two</p>", str(resp.data))       
+
+    def test_search_players_fuzzy(self):
+        """Does search ignore case, tolerate typos and match on college?"""
+        p = Player(name='Patrick Mahomes',
+                   age=28,
+                   height="6' 2\"",
+                   weight="225 lbs",
+                   college="Texas Tech",
+                   group="Offense",
+                   position="QB",
+                   number=15,
+                   salary="$1,000,000",
+                   seasons=7,
+                   image_url=None,
+                   lookup_id=6666)
+        p.id = 9876
+        db.session.add(p)
+        db.session.commit()
+
+        with self.client as c:
+
+            for q in ['mahomes', 'MAHOMES', 'mahomez', 'texas tech']:
+                resp = c.get(f'/players?q={q}')
+                self.assertIn("<p>Patrick Mahomes</p>", str(resp.data), q)
+                self.assertNotIn("<p>Player One</p>", str(resp.data), q)
+
+            resp = c.get('/players?q=nobody')
+            self.assertIn("Sorry! No results found.", str(resp.data))
+
+
+    def test_list_players_pages(self):
+        """Are players split into pages with working next/prev links?"""
+        for n, name in enumerate(['Player Three', 'Player Two']):
+            p = Player(name=name, group="Defense", lookup_id=7000 + n)
+            p.id = 9000 + n
+            db.session.add(p)
+        db.session.commit()
+
+        app.config['PAGE_SIZE'] = 2
+        try:
+            with self.client as c:
+
+                resp = c.get('/players')
+                html = resp.get_data(as_text=True)
+                self.assertIn("<p>Player One</p>", html)
+                self.assertIn("<p>Player Three</p>", html)
+                self.assertNotIn("<p>Player Two</p>", html)
+                self.assertNotIn('id="prev-page"', html)
+
+                resp = c.get(page_link(html, 'next-page'))
+                html = resp.get_data(as_text=True)
+                self.assertIn("<p>Player Two</p>", html)
+                self.assertNotIn("<p>Player One</p>", html)
+                self.assertNotIn('id="next-page"', html)
+
+                resp = c.get(page_link(html, 'prev-page'))
+                self.assertIn("<p>Player One</p>", resp.get_data(as_text=True))
+        finally:
+            app.config['PAGE_SIZE'] = 48
+
+    def test_list_players_tampered_cursor(self):
+        """Is a cursor with the wrong shape or types ignored instead of failing the page?"""
+        for values in ([[1], [2]], ['a', 'b'], [1, 2], ['Player', None]):
+            resp = self.client.get(f'/players?after={encode_cursor(values)}')
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn("<p>Player One</p>", resp.get_data(as_text=True))
+
+    def test_list_players_by_popularity(self):
+        """Does ?sort=popular page through players by favorite count, most first?"""
+        for n, count in enumerate([3, 1]):
+            p = Player(name=f'Popular {n}', group="Defense", lookup_id=7000 + n,
+                       favorite_count=count)
+            p.id = 9000 + n
+            db.session.add(p)
+        db.session.commit()
+
+        app.config['PAGE_SIZE'] = 2
+        try:
+            with self.client as c:
+                resp = c.get('/players?sort=popular')
+                html = resp.get_data(as_text=True)
+                self.assertLess(html.index("<p>Popular 0</p>"), html.index("<p>Popular 1</p>"))
+                self.assertNotIn("<p>Player One</p>", html)
+
+                next_url = page_link(html, 'next-page')
+                self.assertIn('sort=popular', next_url)
+                resp = c.get(next_url)
+                html = resp.get_data(as_text=True)
+                self.assertIn("<p>Player One</p>", html)
+                self.assertNotIn("<p>Popular 0</p>", html)
+
+                resp = c.get(page_link(html, 'prev-page'))
+                html = resp.get_data(as_text=True)
+                self.assertIn("<p>Popular 0</p>", html)
+                self.assertIn("<p>Popular 1</p>", html)
+        finally:
+            app.config['PAGE_SIZE'] = 48
+
+    def test_list_players_by_popularity_not_revalidated(self):
+        """Is ?sort=popular always re-rendered, since favorite counts aren't in the ETag?"""
+        with self.client as c:
+            resp = c.get('/players?sort=popular')
+            self.assertNotIn('ETag', resp.headers)
+
+            resp = c.get('/players?sort=popular', headers={'If-None-Match': '*'})
+            self.assertEqual(resp.status_code, 200)
+
+            self.assertIn('ETag', c.get('/players').headers)
+
+    def test_leaderboard(self):
+        """Does the leaderboard rank players by favorites kept up to date by the favorites API?"""
+        p = Player(name='Player Two', group="Defense", lookup_id=6666)
+        p.id = 9876
+        db.session.add(p)
+        db.session.commit()
+
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.testuser_id
+
+            c.post('/api/favorites', json={'ops': [{'kind': 'player', 'id': 9876, 'favorite': True}]})
+            self.assertEqual(Player.query.get(9876).favorite_count, 1)
+
+            resp = c.get('/leaderboard')
+            html = resp.get_data(as_text=True)
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn("<p>Player Two</p>", html)
+            self.assertIn("Favorites: 1", html)
+            self.assertNotIn("<p>Player One</p>", html)
@@ -0,0 +1,99 @@
+"""Roster snapshot tests."""
+
+import os
+from unittest import TestCase
+
+from models import db
+
+os.environ['DATABASE_URL'] = "postgresql:///sportstest"
+
+import app  # noqa: F401  (sets up the database connection)
+from bulk_load import load_rosters
+from fragment_cache import FragmentCache
+from roster_snapshot import RosterSnapshot, RosterSnapshots, TeamRecord, PlayerRecord
+
+
+def team(id):
+    return TeamRecord(id, f'Team {id}', 'City', f'Coach {id}', None, 'Stadium', None, None, id)
+
+
+def player(id, name, group):
+    return PlayerRecord(id, name, None, None, None, None, group, 'QB', None, None, None, None, id)
+
+
+class FakeVersions:
+    def __init__(self):
+        self.current = 1
+
+    def version(self):
+        return self.current
+
+
+class RosterSnapshotTestCase(TestCase):
+    """Test the in-memory roster indexes and version swaps."""
+
+    def setUp(self):
+        self.loads = []
+        self.versions = FakeVersions()
+
+        def load(version):
+            self.loads.append(version)
+            return RosterSnapshot(version, [team(2), team(1)],
+                                  [player(10, 'Zed', 'Offense'), player(11, 'Amy', 'Defense'),
+                                   player(12, 'Al', 'Offense'), player(13, 'Bo', None)],
+                                  [(1, 10), (1, 11), (1, 12), (2, 13)])
+
+        self.snapshots = RosterSnapshots(self.versions, load)
+
+    def test_indexes(self):
+        snapshot = self.snapshots.get()
+        self.assertEqual([t.id for t in snapshot.teams], [1, 2])
+        self.assertEqual(snapshot.team(2).name, 'Team 2')
+        self.assertIsNone(snapshot.team(3))
+        self.assertEqual([p.name for p in snapshot.roster(1)], ['Al', 'Amy', 'Zed'])
+        self.assertEqual([p.name for p in snapshot.roster(1, 'Offense')], ['Al', 'Zed'])
+        self.assertEqual(snapshot.roster(1, 'Special Teams'), ())
+        self.assertEqual(snapshot.roster(3), ())
+        self.assertEqual([p.name for p in snapshot.players_named('a')], ['Al', 'Amy'])
+        self.assertEqual([p.name for p in snapshot.players_named('AM')], ['Amy'])
+        self.assertEqual(snapshot.players_named('q'), [])
+
+    def test_memberships_without_rows_skipped(self):
+        """Are memberships for teams or players missing from the load left out instead of failing?"""
+        snapshot = RosterSnapshot(1, [team(1)], [player(10, 'Zed', 'Offense')],
+                                  [(1, 10), (1, 99), (5, 10)])
+        self.assertEqual([p.id for p in snapshot.roster(1)], [10])
+        self.assertEqual(snapshot.roster(5), ())
+
+    def test_records_are_read_only(self):
+        with self.assertRaises(AttributeError):
+            self.snapshots.get().player(10).name = 'Changed'
+
+    def test_rebuilt_only_when_version_changes(self):
+        first = self.snapshots.get()
+        self.assertIs(self.snapshots.get(), first)
+        self.assertEqual(self.loads, [1])
+
+        self.versions.current = 2
+        second = self.snapshots.get()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.version, 2)
+        self.assertEqual(self.loads, [1, 2])
+
+
+class ReseedTestCase(TestCase):
+    """Test that a full reseed is noticed by running workers."""
+
+    def test_reseed_rebuilds_snapshot(self):
+        """Is the snapshot rebuilt after a drop-and-reload that ends on the same version number?"""
+        snapshots = RosterSnapshots(FragmentCache(version_ttl=0))
+
+        for names in (['A', 'B'], ['W', 'X']):
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+            for n, name in enumerate(names):
+                load_rosters([({'id': n, 'name': name, 'city': name, 'coach': name, 'owner': None,
+                                'stadium': 'Stadium', 'established': None, 'logo': None}, [])])
+
+            self.assertEqual([team.name for team in snapshots.get().teams], names)
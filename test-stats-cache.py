@@ -0,0 +1,111 @@
+"""Stats cache tests."""
+
+import threading
+import time
+from unittest import TestCase
+
+from stats_cache import StatsCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatsCacheTestCase(TestCase):
+    """Test the read-through player stats cache."""
+
+    def setUp(self):
+        self.calls = []
+        self.clock = FakeClock()
+
+        def fetch(lookup_id, season):
+            self.calls.append((lookup_id, season))
+            return [{'name': 'Passing', 'calls': len(self.calls)}]
+
+        self.cache = StatsCache(fetch, ttl=60, stale_ttl=600, max_entries=2, clock=self.clock)
+
+    def test_hit_after_miss(self):
+        """Is the API only called once for repeated lookups?"""
+        first = self.cache.get(5555, 2023)
+        second = self.cache.get(5555, 2023)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_keyed_on_season(self):
+        """Are different seasons cached separately?"""
+        self.cache.get(5555, 2023)
+        self.cache.get(5555, 2022)
+        self.assertEqual(self.calls, [(5555, 2023), (5555, 2022)])
+
+    def test_stale_while_revalidate(self):
+        """Is a stale entry served immediately and refreshed in the background?"""
+        self.cache.get(5555, 2023)
+        self.clock.now += 120
+
+        stale = self.cache.get(5555, 2023)
+        self.assertEqual(stale[0]['calls'], 1)
+
+        for _ in range(100):
+            if self.cache.stats()['refreshes']:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache.stats()['stale_hits'], 1)
+        self.assertEqual(self.cache.get(5555, 2023)[0]['calls'], 2)
+
+    def test_expired_entry_refetched(self):
+        """Is an entry past its stale window fetched again before returning?"""
+        self.cache.get(5555, 2023)
+        self.clock.now += 1000
+
+        value = self.cache.get(5555, 2023)
+        self.assertEqual(value[0]['calls'], 2)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_lru_eviction(self):
+        """Is the least recently used entry evicted when the cache is full?"""
+        self.cache.get(1, 2023)
+        self.cache.get(2, 2023)
+        self.cache.get(1, 2023)
+        self.cache.get(3, 2023)
+
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.cache.get(2, 2023)
+        self.assertEqual(self.calls.count((2, 2023)), 2)
+        self.assertEqual(self.calls.count((1, 2023)), 1)
+
+    def test_concurrent_misses_coalesced(self):
+        """Do concurrent misses for the same key share one API call?"""
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(lookup_id, season):
+            calls.append((lookup_id, season))
+            release.wait(5)
+            return [{'name': 'Passing'}]
+
+        cache = StatsCache(slow_fetch, ttl=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(5555, 2023)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [(5555, 2023)])
+        self.assertEqual(results, [[{'name': 'Passing'}]] * 5)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['coalesced'], 4)
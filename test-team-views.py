@@ -5,11 +5,12 @@ from models import db, connect_db, User, Player, Team
 
 os.environ['DATABASE_URL'] = "postgresql:///sportstest"
 
-from app import app, CURR_USER_KEY
+from app import app, fragments, rosters, CURR_USER_KEY
 
 db.create_all()
 
 app.config['WTF_CSRF_ENABLED'] = False
+app.config['QUERY_BUDGET_STRICT'] = True
 
 
 class TeamViewTestCase(TestCase):
@@ -199,3 +200,178 @@ class TeamViewTestCase(TestCase):
             resp = c.get('teams/4321/special-teams')
             self.assertIn('<i class="fa fa-heart"></i>', str(resp.data))       
 
+
+    def test_roster_only_shows_team_players(self):
+        """Does a roster page leave out players from other teams in the same group?"""
+        other = Team(name="Other Team",
+                     city="Denver",
+                     coach="Coach Other",
+                     stadium="Other Stadium")
+        other.id = 5432
+        p = Player(name='Player Two',
+                   age=27,
+                   height="5'",
+                   weight="200 lbs",
+                   college="LSU",
+                   group="Offense",
+                   position="RB",
+                   number=10,
+                   salary="$1,000,000",
+                   seasons=5,
+                   image_url=None,
+                   lookup_id=6666)
+        p.id = 9876
+        other.players.append(p)
+        db.session.add(other)
+        db.session.commit()
+
+        with self.client as c:
+
+            resp = c.get("/teams/4321/offense")
+            self.assertIn('<p>Player One</p>', str(resp.data))
+            self.assertNotIn('<p>Player Two</p>', str(resp.data))
+
+            resp = c.get("/teams/5432/offense")
+            self.assertIn('<p>Player Two</p>', str(resp.data))
+            self.assertNotIn('<p>Player One</p>', str(resp.data))
+
+    def test_roster_query_count_does_not_grow_with_roster(self):
+        """Does a bigger roster render with the same number of queries?"""
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.testuser_id
+
+            # first request caches the logged-in user in the session
+            c.get("/teams/4321")
+            db.session.expire_all()
+            fragments.clear()
+            rosters.clear()
+            resp = c.get("/teams/4321/offense")
+            small = int(resp.headers['X-Query-Count'])
+
+            for n in range(20):
+                p = Player(name=f'Extra Player {n}',
+                           group="Offense",
+                           position="WR",
+                           lookup_id=7000 + n)
+                self.testteam.players.append(p)
+            db.session.commit()
+
+            db.session.expire_all()
+            fragments.clear()
+            rosters.clear()
+            resp = c.get("/teams/4321/offense")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(int(resp.headers['X-Query-Count']), small)
+
+    def test_show_team_depth_chart(self):
+        """Is the roster split by group and position, with favorites listed when logged in?"""
+        p = Player(name='Player Two',
+                   group="Defense",
+                   position="LB",
+                   lookup_id=6666)
+        p.id = 9876
+        self.testteam.players.append(p)
+        user = User.query.get(self.testuser_id)
+        user.favorite_players.append(p)
+        db.session.commit()
+
+        with self.client as c:
+            resp = c.get("/teams/4321/depth-chart")
+            html = str(resp.data)
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('<h4 class="col-12">QB</h4>', html)
+            self.assertIn('<h4 class="col-12">LB</h4>', html)
+            self.assertNotIn('Your Favorites', html)
+
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.testuser_id
+
+            resp = c.get("/teams/4321/depth-chart")
+            html = str(resp.data)
+            self.assertIn('Your Favorites', html)
+            self.assertEqual(html.count('<p>Player Two</p>'), 2)
+            self.assertEqual(html.count('<p>Player One</p>'), 1)
+            # both copies of a favorite share a data-id, never an element id
+            self.assertEqual(html.count('data-id="9876"'), 2)
+            self.assertNotIn(' id="9876"', html)
+
+    def test_roster_page_served_from_cache(self):
+        """Is a repeat roster page rendered from cache, and re-rendered once the roster changes?"""
+        with self.client as c:
+            resp = c.get("/teams/4321/offense")
+            self.assertIn('<p>Player One</p>', str(resp.data))
+
+            resp = c.get("/teams/4321/offense")
+            self.assertEqual(resp.headers['X-Query-Count'], '0')
+
+            player = Player.query.get(self.testplayer_id)
+            player.name = 'Player Renamed'
+            db.session.commit()
+
+            resp = c.get("/teams/4321/offense")
+            self.assertIn('<p>Player Renamed</p>', str(resp.data))
+            self.assertNotIn('<p>Player One</p>', str(resp.data))
+
+    def test_cached_page_fills_favorites_per_user(self):
+        """Does a cached roster page still show the logged-in user's own favorites?"""
+        user = User.query.get(self.testuser_id)
+        user.favorite_players.append(Player.query.get(self.testplayer_id))
+        db.session.commit()
+
+        with self.client as c:
+            resp = c.get("/teams/4321/offense")
+            self.assertNotIn('fa-heart', str(resp.data))
+            self.assertNotIn('<!--favorite', str(resp.data))
+
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.testuser_id
+
+            resp = c.get("/teams/4321/offense")
+            html = str(resp.data)
+            self.assertIn('class="player-fav" data-id="1234"', html)
+            self.assertIn('btn-danger', html)
+            self.assertIn('data-id="4321" class="team-fav"', html)
+
+    def test_conditional_get(self):
+        """Is a repeat request with a matching ETag answered with 304, until something changes?"""
+        with self.client as c:
+            resp = c.get("/teams/4321/offense")
+            etag = resp.headers['ETag']
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('Cookie', resp.headers['Vary'])
+
+            resp = c.get("/teams/4321/offense", headers={'If-None-Match': etag})
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(resp.data, b'')
+
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.testuser_id
+
+            resp = c.get("/teams/4321/offense", headers={'If-None-Match': etag})
+            self.assertEqual(resp.status_code, 200)
+            user_etag = resp.headers['ETag']
+            self.assertIn('private', resp.headers['Cache-Control'])
+
+            c.post("/users/toggle-favorite-player/1234")
+            resp = c.get("/teams/4321/offense", headers={'If-None-Match': user_etag})
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('btn-danger', str(resp.data))
+
+    def test_conditional_get_after_roster_change(self):
+        """Does a roster change invalidate the ETag and Last-Modified?"""
+        with self.client as c:
+            resp = c.get("/teams/4321")
+            etag = resp.headers['ETag']
+            last_modified = resp.headers['Last-Modified']
+
+            resp = c.get("/teams/4321", headers={'If-Modified-Since': last_modified})
+            self.assertEqual(resp.status_code, 304)
+
+            player = Player.query.get(self.testplayer_id)
+            player.name = 'Player Renamed'
+            db.session.commit()
+
+            resp = c.get("/teams/4321", headers={'If-None-Match': etag})
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('<p>Player Renamed</p>', str(resp.data))
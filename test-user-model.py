@@ -4,7 +4,8 @@ import os
 from unittest import TestCase
 from sqlalchemy import exc
 
-from models import db, User, Player, Team
+from models import db, User, Player, Team, recount_favorites
+from passwords import hasher
 
 os.environ['DATABASE_URL'] = "postgresql:///sportstest"
 
@@ -113,6 +114,20 @@ class UserModelTestCase(TestCase):
 
         self.assertTrue(self.u1.is_favorite_team(self.t1))
 
+    def test_load_favorite_ids(self):
+        """Are favorite team and player ids loaded together and used by the favorite checks?"""
+        self.u1.favorite_teams.append(self.t1)
+        self.u1.favorite_players.append(self.p1)
+        db.session.commit()
+        db.session.expire_all()
+
+        user = User.query.get(self.uid1)
+        self.assertEqual(user.load_favorite_ids(), ({self.tid1}, {self.pid1}))
+        self.assertTrue(user.is_favorite_team(self.t1))
+        self.assertTrue(user.is_favorite_player(self.p1))
+        self.assertNotIn('favorite_teams', user.__dict__)
+        self.assertNotIn('favorite_players', user.__dict__)
+
     def test_register(self):
         """Does sign-up successfully make a new user with a hashed pass?"""
         new_user = User.register('test3', 'test3@test.com', 'password', None)
@@ -168,4 +183,41 @@ class UserModelTestCase(TestCase):
 
     def test_invalid_password(self):
         """Tests that authentication returns false on invalid password"""
-        self.assertFalse(User.authenticate(self.u1.username, "badpassword"))
\ No newline at end of file
+        self.assertFalse(User.authenticate(self.u1.username, "badpassword"))
+
+    def test_authenticate_rehashes_at_new_cost(self):
+        """Is a password hashed at an old cost factor rehashed on a successful login?"""
+        rounds = hasher.rounds
+        old_hash = self.u1.password
+        self.assertIn(f'${rounds:02d}$', old_hash)
+        try:
+            hasher.rounds = 4
+            u = User.authenticate(self.u1.username, 'password')
+            self.assertNotEqual(u.password, old_hash)
+            self.assertIn('$04$', u.password)
+            self.assertFalse(hasher.needs_rehash(u.password))
+            self.assertTrue(User.authenticate(self.u1.username, 'password'))
+        finally:
+            hasher.rounds = rounds
+
+
+    def test_favorite_counts(self):
+        """Do set_favorites/clear_favorites keep favorite_count right, even when repeated?"""
+        User.set_favorites(self.uid1, players={self.pid1: True})
+        User.set_favorites(self.uid1, players={self.pid1: True})
+        db.session.commit()
+        self.assertEqual(Player.query.get(self.pid1).favorite_count, 1)
+
+        User.clear_favorites(self.uid1)
+        User.clear_favorites(self.uid1)
+        db.session.commit()
+        self.assertEqual(Player.query.get(self.pid1).favorite_count, 0)
+
+
+    def test_recount_favorites(self):
+        """Does recount_favorites repair counters that drifted?"""
+        User.set_favorites(self.uid1, players={self.pid1: True})
+        Player.query.filter_by(id=self.pid1).update({'favorite_count': 7})
+        recount_favorites()
+        db.session.commit()
+        self.assertEqual(Player.query.get(self.pid1).favorite_count, 1)
@@ -1,15 +1,20 @@
 import os
 from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import event
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from models import db, connect_db, User, Player, Team
 
 os.environ['DATABASE_URL'] = "postgresql:///sportstest"
 
-from app import app, CURR_USER_KEY
+from app import app, ip_limiter, username_limiter, CURR_USER_KEY
 
 db.create_all()
 
 app.config['WTF_CSRF_ENABLED'] = False
+app.config['QUERY_BUDGET_STRICT'] = True
 
 
 class UserViewTestCase(TestCase):
@@ -96,6 +101,23 @@ class UserViewTestCase(TestCase):
             resp = c.get('/users/1234/players')
             self.assertIn('<i class="fa fa-heart"></i>', str(resp.data))
 
+    def test_favorite_players_in_other_groups(self):
+        """Are favorites outside the three standard groups still listed?"""
+        p = Player(name='Player Two',
+                   group="Practice Squad",
+                   position="WR",
+                   lookup_id=6666)
+        p.id = 9876
+        user = User.query.get(self.testuser_id)
+        user.favorite_players.append(p)
+        db.session.commit()
+
+        resp = self.client.get('/users/1234/players')
+        html = str(resp.data)
+        self.assertIn('<h2>Practice Squad</h2>', html)
+        self.assertIn('<p>Player Two</p>', html)
+        self.assertIn('<h2>Special Teams</h2>', html)
+
     
     def test_edit_profile(self):
         """Does the edit page populate if the user is logged in?"""
@@ -170,5 +192,126 @@ class UserViewTestCase(TestCase):
 
             resp=c.get('/users?q=new')
             self.assertNotIn("<p>testuser</p>", str(resp.data))
-            self.assertIn("<p>newuser</p>", str(resp.data))       
-    
+            self.assertIn("<p>newuser</p>", str(resp.data))
+
+
+    def test_session_user_cached(self):
+        """After logging in, are pages served without querying the users table?"""
+        with self.client as c:
+            resp = c.post('/login', data={'username': 'testuser', 'password': 'testuser'})
+            self.assertEqual(resp.status_code, 302)
+
+            statements = []
+            def record(conn, cursor, statement, *args):
+                statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                resp = c.get('/login')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+            self.assertIn('testuser', str(resp.data))
+            self.assertFalse([sql for sql in statements if 'FROM users' in sql], statements)
+
+
+    def test_edit_profile_refreshes_session_user(self):
+        """Does editing the profile update the cached username?"""
+        with self.client as c:
+            c.post('/login', data={'username': 'testuser', 'password': 'testuser'})
+            c.post('/users/profile', data={'username': 'renamed', 'email': 'test@test.com',
+                                           'image_url': '', 'password': 'testuser'})
+
+            resp = c.get('/users')
+            self.assertIn('alt="renamed"', str(resp.data))
+
+
+
+    def test_login_rate_limited(self):
+        """Are repeated logins for one username refused before any password check?"""
+        limit = username_limiter.limit
+        username_limiter.limit = 2
+        try:
+            with self.client as c:
+                for _ in range(2):
+                    resp = c.post('/login', data={'username': 'testuser', 'password': 'wrongpass'})
+                    self.assertEqual(resp.status_code, 200)
+
+                with patch('models.verify_password') as verify:
+                    resp = c.post('/login', data={'username': 'testuser', 'password': 'testuser'})
+                    verify.assert_not_called()
+                self.assertEqual(resp.status_code, 429)
+                self.assertIn('Retry-After', resp.headers)
+        finally:
+            username_limiter.limit = limit
+            username_limiter.reset('testuser')
+
+    def test_login_rate_limited_per_forwarded_ip(self):
+        """Behind the proxy, does each visitor get their own IP bucket?"""
+        limit = ip_limiter.limit
+        ip_limiter.limit = 1
+        wsgi_app = app.wsgi_app
+        app.wsgi_app = ProxyFix(wsgi_app, x_for=1)
+        try:
+            with self.client as c:
+                login = {'username': 'testuser', 'password': 'wrongpass'}
+                resp = c.post('/login', data=login, headers={'X-Forwarded-For': '203.0.113.1'})
+                self.assertEqual(resp.status_code, 200)
+                resp = c.post('/login', data=login, headers={'X-Forwarded-For': '203.0.113.1'})
+                self.assertEqual(resp.status_code, 429)
+                resp = c.post('/login', data=login, headers={'X-Forwarded-For': '203.0.113.2'})
+                self.assertEqual(resp.status_code, 200)
+        finally:
+            app.wsgi_app = wsgi_app
+            ip_limiter.limit = limit
+            for ip in ('203.0.113.1', '203.0.113.2'):
+                ip_limiter.reset(ip)
+            username_limiter.reset('testuser')
+
+    def test_forwarded_for_ignored_without_proxy(self):
+        """With no proxy configured, can a client dodge the IP limit by sending X-Forwarded-For?"""
+        self.assertEqual(app.config['PROXY_FIX_HOPS'], 0)
+        limit = ip_limiter.limit
+        ip_limiter.limit = 1
+        ip_limiter.reset('127.0.0.1')
+        try:
+            with self.client as c:
+                login = {'username': 'testuser', 'password': 'wrongpass'}
+                resp = c.post('/login', data=login, headers={'X-Forwarded-For': '203.0.113.1'})
+                self.assertEqual(resp.status_code, 200)
+                resp = c.post('/login', data=login, headers={'X-Forwarded-For': '203.0.113.2'})
+                self.assertEqual(resp.status_code, 429)
+        finally:
+            ip_limiter.limit = limit
+            ip_limiter.reset('127.0.0.1')
+            username_limiter.reset('testuser')
+
+    def test_batch_favorites(self):
+        """Does one POST apply a batch of favorite changes, idempotently?"""
+        other = Player(name='Player Two', group="Defense", position="LB", lookup_id=6666)
+        other.id = 9876
+        db.session.add(other)
+        db.session.commit()
+
+        with self.client as c:
+            resp = c.post('/api/favorites', json={'ops': []})
+            self.assertEqual(resp.status_code, 401)
+
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.testuser_id
+
+            ops = [{'kind': 'player', 'id': 9876, 'favorite': True},
+                   {'kind': 'player', 'id': 1234, 'favorite': False},
+                   {'kind': 'player', 'id': 9876, 'favorite': True},
+                   {'kind': 'team', 'id': 4321, 'favorite': True},
+                   {'kind': 'player', 'id': 5555, 'favorite': True}]
+            resp = c.post('/api/favorites', json={'ops': ops})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json, {'team_ids': [4321], 'player_ids': [9876]})
+
+            resp = c.post('/api/favorites', json={'ops': ops})
+            self.assertEqual(resp.json, {'team_ids': [4321], 'player_ids': [9876]})
+
+            resp = c.post('/api/favorites', json={'ops': [{'kind': 'coach', 'id': 1, 'favorite': True}]})
+            self.assertEqual(resp.status_code, 400)
+
+        self.assertEqual([p.id for p in User.query.get(self.testuser_id).favorite_players], [9876])